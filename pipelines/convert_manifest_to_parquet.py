@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Convert an S3 manifest CSV (e.g. water_rights_visualizer/S3_filenames.csv) to a typed Parquet copy next to it.
+
+S3Source reads the Parquet copy when it is at least as new as the CSV, so rerun this after updating the manifest.
+Requires pyarrow.
+"""
+
+import argparse
+import logging
+import os
+
+import pandas as pd
+
+from water_rights_visualizer.S3_source import parse_S3_table_dates
+
+logger = logging.getLogger(__name__)
+
+
+def convert_manifest_to_parquet(csv_path: str, parquet_path: str = None) -> str:
+    """Write the manifest with pre-typed columns so readers don't parse the dates and tiles again."""
+    if parquet_path is None:
+        parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+
+    manifest = pd.read_csv(csv_path)
+    manifest = pd.DataFrame(
+        {
+            "filename": manifest["filename"].astype("string"),
+            "variable": manifest["variable"].astype("category"),
+            "date": parse_S3_table_dates(manifest["date"]),
+            "tile": manifest["tile"].astype("int32"),
+        }
+    )
+    manifest.to_parquet(parquet_path, index=False)
+
+    logger.info(f"Wrote {len(manifest)} manifest rows to {parquet_path}")
+    return parquet_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an S3 manifest CSV to Parquet")
+    parser.add_argument("csv_path", help="Path to the manifest CSV")
+    parser.add_argument("--output", help="Path to the Parquet file (default: the CSV path with a .parquet extension)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    convert_manifest_to_parquet(args.csv_path, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 TESTS_ROOT = PROJECT_ROOT / "tests"
 TEST_DATA_ROOT = PROJECT_ROOT / "test_data"
 VARIABLES_YAML = PROJECT_ROOT / "variables.yaml"
+TILE_SERVER_ROOT = PROJECT_ROOT / "tile_server"
 MANIFEST_CSV = PROJECT_ROOT / "water_rights_visualizer" / "S3_filenames.csv"
 ARD_TILES_GEOJSON = PROJECT_ROOT / "water_rights_visualizer" / "ARD_tiles.geojson"
 MANIFEST_COVERAGE_RULES = TESTS_ROOT / "manifest_coverage_rules.yaml"
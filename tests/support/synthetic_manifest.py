@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Tuple
+
+from water_rights_visualizer.S3_source import S3Source
+
+
+def write_manifest_csv(output_path: Path, rows: Iterable[Tuple[str, str, str, str]]) -> Path:
+    """Write an S3 manifest CSV from (filename, variable, date, tile) rows."""
+    output_path = Path(output_path)
+    lines = ["filename,variable,date,tile"] + [",".join(row) for row in rows]
+    output_path.write_text("\n".join(lines) + "\n")
+    return output_path
+
+
+def build_local_s3_source(S3_table_filename: Path, temporary_directory: Path, bucket_name: str = "unused") -> S3Source:
+    """Build an S3Source over a manifest that keeps its temporary files; nothing is fetched until a file is requested."""
+    return S3Source(
+        bucket_name=bucket_name,
+        temporary_directory=str(temporary_directory),
+        S3_table_filename=str(S3_table_filename),
+        remove_temporary_files=False,
+    )
@@ -106,3 +106,28 @@ def build_synthetic_openet_year(
             "OREGON_STATE_PRISM",
         )
     return output_root
+
+
+def write_float_geotiff(output_path: Path, data, transform=None, crs: str = "EPSG:4326") -> Path:
+    """Write a single-band float32 GeoTIFF with NaN nodata, by default on a 1 degree EPSG:4326 grid at (0, rows)."""
+    output_path = Path(output_path)
+    data = np.asarray(data, dtype=np.float32)
+    rows, cols = data.shape
+    if transform is None:
+        transform = from_origin(0, rows, 1, 1)
+
+    with rasterio.open(
+        output_path,
+        "w",
+        driver="GTiff",
+        height=rows,
+        width=cols,
+        count=1,
+        dtype="float32",
+        crs=crs,
+        transform=transform,
+        nodata=np.nan,
+    ) as dataset:
+        dataset.write(data, 1)
+
+    return output_path
@@ -1,4 +1,17 @@
+import numpy as np
+import pandas as pd
 import pytest
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+from water_rights_visualizer.calculate_cloud_coverage_percent import (
+    UNCERTAINTY_SUBSET_PATTERN,
+    calculate_cloud_coverage_percent,
+    get_nan_tiff_roi_average,
+    get_roi_mask,
+)
+
+from tests.support.synthetic_raster import write_float_geotiff
 
 
 @pytest.mark.unit
@@ -21,3 +34,82 @@ def test_cloud_coverage_percent_zero_is_not_treated_as_missing(cloud_coverage_pe
         percentage = min(percentage, 1)
 
     assert percentage == expected
+
+
+@pytest.mark.unit
+def test_nan_tiff_roi_average_masks_in_memory(tmp_path):
+    data = np.array(
+        [
+            [1.0, 3.0, 100.0],
+            [np.nan, -2.0, 100.0],
+            [100.0, 100.0, 100.0],
+        ],
+        dtype=np.float32,
+    )
+    subset_file = write_float_geotiff(tmp_path / "2021.02.01_ET_MAX_subset.tif", data)
+
+    nan_directory = tmp_path / "nan"
+    nan_directory.mkdir()
+    # Covers the upper left 2x2 pixels
+    ROI_geometry = [box(0, 1, 2, 3)]
+
+    average = get_nan_tiff_roi_average(str(subset_file), ROI_geometry, str(nan_directory))
+
+    assert average == pytest.approx(2.0)
+    assert list(nan_directory.iterdir()) == []
+
+
+@pytest.mark.unit
+def test_roi_mask_is_rasterized_once_per_grid():
+    ROI_geometry = [box(0, 1, 2, 3)]
+    transform = from_origin(0, 3, 1, 1)
+    roi_masks = {}
+
+    roi_mask = get_roi_mask(ROI_geometry, (3, 3), transform, roi_masks)
+
+    assert roi_mask.tolist() == [[True, True, False], [True, True, False], [False, False, False]]
+    assert get_roi_mask(ROI_geometry, (3, 3), transform, roi_masks) is roi_mask
+    assert len(roi_masks) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "filename,expected",
+    [
+        ("2021.02.01_ROI_ET_MIN_subset.tif", ("2021", "02", "01", "ET_MIN")),
+        ("2021.12.01_My_ROI_PPT_subset.tif", ("2021", "12", "01", "PPT")),
+        ("2021.02.01_ROI_ET_subset.tif", None),
+        ("2021.02.01_ROI_COUNT_subset.tif.aux.xml", None),
+    ],
+)
+def test_uncertainty_subset_pattern(filename, expected):
+    match = UNCERTAINTY_SUBSET_PATTERN.match(filename)
+    assert (match.groups() if match else None) == expected
+
+
+@pytest.mark.unit
+def test_cloud_coverage_keeps_existing_percentages_without_new_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "water_rights_visualizer.calculate_cloud_coverage_percent.get_landsat_month_stats", lambda *args, **kwargs: None
+    )
+    subset_directory = tmp_path / "subset"
+    subset_directory.mkdir()
+    for variable, value in [("ET_MIN", 2.0), ("ET_MAX", 4.0), ("COUNT", 1.0), ("PPT", 3.0)]:
+        write_float_geotiff(subset_directory / f"2021.02.01_ROI_{variable}_subset.tif", np.full((3, 3), value))
+
+    monthly_nan_directory = tmp_path / "monthly"
+    monthly_nan_directory.mkdir()
+    (monthly_nan_directory / "2021.csv").write_text(
+        "year,month,percent_nan,avg_min,avg_max,ppt_avg\n2021,2,12.5,0,0,0\n2021,3,40.0,0,0,0\n2021,4,,0,0,0\n"
+    )
+
+    calculate_cloud_coverage_percent(
+        [box(0, 1, 2, 3)], str(subset_directory), str(tmp_path / "nan"), str(monthly_nan_directory), 2021
+    )
+
+    monthly = pd.read_csv(monthly_nan_directory / "2021.csv").set_index("month")
+    assert len(monthly) == 12
+    assert monthly.loc[2, "percent_nan"] == pytest.approx(12.5)
+    assert monthly.loc[2, ["avg_min", "avg_max", "ppt_avg"]].tolist() == [2.0, 4.0, 3.0]
+    assert monthly.loc[3, "percent_nan"] == pytest.approx(40.0)
+    assert pd.isna(monthly.loc[4, "percent_nan"])
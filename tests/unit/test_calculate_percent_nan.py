@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+from water_rights_visualizer.calculate_percent_nan import calculate_percent_nan
+
+from tests.support.synthetic_raster import write_float_geotiff
+
+
+@pytest.mark.unit
+class TestCalculatePercentNan:
+    def test_monthly_percent_nan_within_roi(self, tmp_path):
+        subset_directory = tmp_path / "subset"
+        subset_directory.mkdir()
+        nan = np.nan
+        write_float_geotiff(subset_directory / "2021.02.01_ROI_ET_subset.tif", [[1, nan, 5], [1, 1, 5], [5, 5, 5]])
+        write_float_geotiff(subset_directory / "2021.02.09_ROI_ET_subset.tif", [[nan, nan, 5], [1, 1, 5], [5, 5, 5]])
+        write_float_geotiff(subset_directory / "2021.03.01_ROI_ET_subset.tif", [[1, 1, 5], [1, 1, nan], [5, 5, 5]])
+        write_float_geotiff(subset_directory / "2021.02.01_ROI_PPT_subset.tif", [[2, 4, 9], [2, 4, 9], [9, 9, 9]])
+
+        # Covers the upper left 2x2 pixels
+        calculate_percent_nan(
+            [box(0, 1, 2, 3)],
+            str(subset_directory),
+            str(tmp_path / "nan"),
+            str(tmp_path / "monthly"),
+            2021,
+        )
+
+        monthly = pd.read_csv(tmp_path / "monthly" / "2021.csv").set_index("month")
+        # 1 of 4 and 2 of 4 ROI cells are NaN in February's subsets, NaN outside the ROI doesn't count in March
+        assert monthly.loc[2, "percent_nan"] == pytest.approx(37.5)
+        assert monthly.loc[3, "percent_nan"] == pytest.approx(0.0)
+        assert monthly.loc[2, "ppt_avg"] == pytest.approx(3.0)
@@ -1,11 +1,15 @@
+import numpy as np
 import pytest
 from datetime import date
 
 from water_rights_visualizer.date_helpers import (
     calculate_hours_of_sunlight,
+    daylight_hours_series,
     get_days_in_month,
     get_days_in_year,
     get_one_month_slice,
+    parse_date,
+    sha_deg_from_doy_lat,
 )
 from shapely.geometry import Polygon
 
@@ -38,3 +42,31 @@ class TestDateHelpers:
         assert january_hours < june_hours
         assert 9 <= january_hours <= 11
         assert 13 <= june_hours <= 15
+
+    def test_parse_date_iso_and_fallback_formats(self):
+        assert parse_date("2021-02-01") == date(2021, 2, 1)
+        assert parse_date("2021-02-01 00:00:00") == date(2021, 2, 1)
+        assert parse_date("2021.02.01") == date(2021, 2, 1)
+        assert parse_date("Feb 1, 2021") == date(2021, 2, 1)
+        assert parse_date("2021-02-01T12:30:00") == date(2021, 2, 1)
+
+    def test_parse_date_rejects_trailing_garbage(self):
+        with pytest.raises(ValueError):
+            parse_date("2021-02-01junk")
+
+    def test_daylight_hours_series_matches_scalar_calculation(self):
+        roi = Polygon([(-106.5, 34.0), (-106.4, 34.0), (-106.4, 34.1), (-106.5, 34.1)])
+        series = daylight_hours_series(2024, roi.centroid.y)
+        assert len(series) == 366
+        assert series[0] == pytest.approx(calculate_hours_of_sunlight(roi, date(2024, 1, 1)))
+        assert series[166] == pytest.approx(calculate_hours_of_sunlight(roi, date(2024, 6, 15)))
+
+    def test_daylight_hours_series_polar_correction(self):
+        assert daylight_hours_series(2021, 80.0)[171] == pytest.approx(24.0)
+        assert daylight_hours_series(2021, 80.0)[0] == pytest.approx(0.0)
+
+    def test_sha_deg_from_doy_lat_accepts_scalars_and_arrays(self):
+        assert sha_deg_from_doy_lat(172, 80.0) == pytest.approx(180.0)
+        assert sha_deg_from_doy_lat(1, 80.0) == pytest.approx(0.0)
+        doys = np.array([1, 100, 172])
+        assert sha_deg_from_doy_lat(doys, 34.0) == pytest.approx([sha_deg_from_doy_lat(doy, 34.0) for doy in doys])
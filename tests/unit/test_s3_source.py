@@ -1,45 +1,76 @@
 import pytest
+import raster as rt
 
 from datetime import date
 
 from water_rights_visualizer.errors import FileUnavailable
-from water_rights_visualizer.S3_source import S3Source
 
 from tests.support.paths import MANIFEST_CSV
+from tests.support.synthetic_manifest import build_local_s3_source, write_manifest_csv
+from tests.support.synthetic_raster import write_monthly_tile_geotiff
 
 
 @pytest.mark.unit
 class TestS3Source:
-    def test_inventory_includes_monthly_openet_dates(self):
-        source = S3Source(
-            bucket_name="unused",
-            temporary_directory="/tmp/et-tool-test-unused",
-            S3_table_filename=str(MANIFEST_CSV),
-            remove_temporary_files=False,
-        )
+    def test_inventory_includes_monthly_openet_dates(self, tmp_path):
+        source = build_local_s3_source(MANIFEST_CSV, tmp_path / "temp")
         years, dates = source.inventory()
         assert 2021 in years
         assert date(2021, 1, 1) in dates
         assert all(d.day == 1 for d in dates if d.year >= 1985)
 
-    def test_missing_manifest_entry_raises_file_unavailable(self):
-        source = S3Source(
-            bucket_name="unused",
-            temporary_directory="/tmp/et-tool-test-unused",
-            S3_table_filename=str(MANIFEST_CSV),
-            remove_temporary_files=False,
+    def test_inventory_skips_unparseable_dates_and_sorts_years(self, tmp_path):
+        manifest = write_manifest_csv(
+            tmp_path / "manifest.csv",
+            [
+                ("a.tif", "ET", "2021-02-01", "009014"),
+                ("b.tif", "ET", "not-a-date", "009014"),
+                ("c.tif", "ET", "2020-03-01", "009014"),
+                ("d.tif", "PPT", "2021-02-01", "009014"),
+            ],
+        )
+        source = build_local_s3_source(manifest, tmp_path / "temp")
+        years, dates = source.inventory()
+        assert years == [2020, 2021]
+        assert dates == [date(2021, 2, 1), date(2020, 3, 1), date(2021, 2, 1)]
+
+    def test_inventory_parses_non_iso_dates(self, tmp_path, caplog):
+        manifest = write_manifest_csv(
+            tmp_path / "manifest.csv",
+            [
+                ("a.tif", "ET", "2021-02-01", "009014"),
+                ("b.tif", "ET", "2021/03/01", "009014"),
+                ("c.tif", "ET", "Apr 1 2021", "009014"),
+                ("d.tif", "ET", "not-a-date", "009014"),
+            ],
+        )
+        source = build_local_s3_source(manifest, tmp_path / "temp")
+        years, dates = source.inventory()
+        assert dates == [date(2021, 2, 1), date(2021, 3, 1), date(2021, 4, 1)]
+        assert source.S3_table_index[(9014, "ET", "2021-03-01")] == "b.tif"
+        assert "unable to parse date: not-a-date" in caplog.text
+
+    def test_manifest_index_keeps_first_row_per_key(self, tmp_path):
+        manifest = write_manifest_csv(
+            tmp_path / "manifest.csv",
+            [
+                ("first.tif", "ET", "2021-02-01", "009014"),
+                ("second.tif", "ET", "2021-02-01", "009014"),
+                ("other.tif", "PPT", "2021-02-01", "009014"),
+            ],
         )
+        source = build_local_s3_source(manifest, tmp_path / "temp")
+        assert source.S3_table_index[(9014, "ET", "2021-02-01")] == "first.tif"
+        assert source.S3_table_index[(9014, "PPT", "2021-02-01")] == "other.tif"
+
+    def test_missing_manifest_entry_raises_file_unavailable(self, tmp_path):
+        source = build_local_s3_source(MANIFEST_CSV, tmp_path / "temp")
         with pytest.raises(FileUnavailable):
             with source.get_filename(tile="999999", variable_name="ET", acquisition_date=date(1900, 1, 1)):
                 pass
 
-    def test_manifest_lookup_uses_zero_padded_tile(self):
-        source = S3Source(
-            bucket_name="unused",
-            temporary_directory="/tmp/et-tool-test-unused",
-            S3_table_filename=str(MANIFEST_CSV),
-            remove_temporary_files=False,
-        )
+    def test_manifest_lookup_uses_zero_padded_tile(self, tmp_path):
+        source = build_local_s3_source(MANIFEST_CSV, tmp_path / "temp")
         manifest = source.S3_table
         match = manifest[
             (manifest["tile"] == 9014)
@@ -47,3 +78,72 @@ class TestS3Source:
             & (manifest["date"] == "2021-01-01")
         ]
         assert len(match) == 1
+
+    def test_prefetch_downloads_only_missing_files(self, tmp_path):
+        manifest = write_manifest_csv(
+            tmp_path / "manifest.csv",
+            [
+                ("present.tif", "ET", "2021-02-01", "009014"),
+                ("missing.tif", "ET", "2021-03-01", "009014"),
+            ],
+        )
+        source = build_local_s3_source(manifest, tmp_path / "temp", bucket_name="bucket")
+        (tmp_path / "temp" / "present.tif").write_bytes(b"")
+
+        requested = []
+
+        class RecordingClient:
+            def download_file(self, bucket_name, key, filename, Config=None):
+                requested.append((bucket_name, key, filename))
+                with open(filename, "wb"):
+                    pass
+
+        source.s3_client = RecordingClient()
+        downloaded = source.prefetch(
+            [
+                ("9014", "ET", date(2021, 2, 1)),
+                ("9014", "ET", "2021-03-01"),
+                ("999999", "ET", date(2021, 3, 1)),
+            ]
+        )
+
+        local = str(tmp_path / "temp" / "missing.tif")
+        assert requested == [("bucket", "missing.tif", local)]
+        assert downloaded == [local]
+        # Files downloaded in this process are not opened again to verify them
+        assert any(signature[0] == local for signature in source.verified_files)
+
+    def test_existing_file_is_verified_once(self, tmp_path, monkeypatch):
+        local = write_monthly_tile_geotiff(tmp_path / "temp", "009014", date(2021, 2, 1), "ET", 50.0, "OPENET")
+        manifest = write_manifest_csv(tmp_path / "manifest.csv", [(local.name, "ET", "2021-02-01", "009014")])
+        source = build_local_s3_source(manifest, tmp_path / "temp")
+
+        with source.get_filename(tile="9014", variable_name="ET", acquisition_date=date(2021, 2, 1)) as filename:
+            assert filename == str(local)
+
+        def fail_open(*args, **kwargs):
+            raise AssertionError("verified file opened again")
+
+        monkeypatch.setattr(rt.Raster, "open", fail_open)
+        source.filenames.clear()
+
+        with source.get_filename(tile="9014", variable_name="ET", acquisition_date=date(2021, 2, 1)) as filename:
+            assert filename == str(local)
+        assert local.exists()
+
+    def test_parquet_manifest_matches_csv_index(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        from pipelines.convert_manifest_to_parquet import convert_manifest_to_parquet
+
+        manifest = write_manifest_csv(
+            tmp_path / "manifest.csv",
+            [
+                ("a.tif", "ET", "2021-02-01", "009014"),
+                ("b.tif", "PPT", "2021-03-01", "009014"),
+            ],
+        )
+        csv_source = build_local_s3_source(manifest, tmp_path / "temp")
+        convert_manifest_to_parquet(str(manifest))
+        parquet_source = build_local_s3_source(manifest, tmp_path / "temp")
+        assert parquet_source.S3_table_index == csv_source.S3_table_index
+        assert parquet_source.inventory() == csv_source.inventory()
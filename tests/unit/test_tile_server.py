@@ -0,0 +1,166 @@
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.features import geometry_mask
+from rasterio.transform import from_bounds, from_origin
+from shapely.geometry import box, mapping
+
+from tests.support.paths import TILE_SERVER_ROOT
+from tests.support.synthetic_raster import write_float_geotiff
+
+pytest.importorskip("fastapi")
+mercantile = pytest.importorskip("mercantile")
+
+# 2 km EPSG:3857 grid with a margin around New Mexico, so tiles at the state border are interior to the raster
+RASTER_TRANSFORM = from_origin(-12600000, 4700000, 2000, 2000)
+RASTER_WIDTH = 800
+RASTER_HEIGHT = 650
+
+
+@pytest.fixture(scope="module")
+def tile_server():
+    # main.py is run from its own directory, where it loads rois/nm.json on import
+    cwd = os.getcwd()
+    os.chdir(TILE_SERVER_ROOT)
+    try:
+        spec = importlib.util.spec_from_file_location("tile_server_main", TILE_SERVER_ROOT / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+@pytest.fixture
+def synthetic_raster(tmp_path):
+    path = write_float_geotiff(
+        tmp_path / "synthetic_3857.tif",
+        np.ones((RASTER_HEIGHT, RASTER_WIDTH)),
+        transform=RASTER_TRANSFORM,
+        crs="EPSG:3857",
+    )
+    with rasterio.open(path) as src:
+        return src.transform, src.width, src.height
+
+
+def leaflet_y(z, y):
+    """Convert an XYZ tile row to the flipped row the tile server's routes take."""
+    return (2**z - 1) - y
+
+
+def rasterized_outside_mask(tile_server, z, x, y, geometry):
+    """The mask the tile server rasterized before sampling the native-grid mask, cropped to the data portion."""
+    tile_transform = from_bounds(
+        *mercantile.xy_bounds(x, y, z), width=tile_server.TILE_SIZE, height=tile_server.TILE_SIZE
+    )
+    outside_mask = geometry_mask(
+        [tile_server.NM_GEOM3857], out_shape=(tile_server.TILE_SIZE, tile_server.TILE_SIZE), transform=tile_transform
+    )
+    return outside_mask[geometry.y_offset : geometry.y_offset + geometry.output_height, : geometry.output_width]
+
+
+def near_boundary(mask):
+    """True for pixels with a differing neighbour, i.e. within one pixel of the mask's boundary."""
+    height, width = mask.shape
+    padded = np.pad(mask, 1, mode="edge")
+    near = np.zeros_like(mask)
+    for row_shift in (-1, 0, 1):
+        for col_shift in (-1, 0, 1):
+            near |= padded[1 + row_shift : 1 + row_shift + height, 1 + col_shift : 1 + col_shift + width] != mask
+    return near
+
+
+@pytest.mark.unit
+class TestTileGeometry:
+    def test_tile_outside_raster_has_no_geometry(self, tile_server, synthetic_raster):
+        # Over London, far from the raster
+        tile = mercantile.tile(0.0, 51.5, 6)
+        assert tile_server.get_tile_geometry(*synthetic_raster, 6, tile.x, leaflet_y(6, tile.y)) is None
+
+    def test_interior_tile_fills_the_output(self, tile_server, synthetic_raster):
+        geometry = tile_server.get_tile_geometry(*synthetic_raster, 6, 12, leaflet_y(6, 25))
+        assert (geometry.output_height, geometry.output_width, geometry.y_offset) == (256, 256, 0)
+        assert not (geometry.at_top_edge or geometry.at_bottom_edge or geometry.at_right_edge)
+
+    def test_tile_clipped_on_both_edges(self, tile_server, synthetic_raster):
+        z, x, y = 4, 3, 6
+        geometry = tile_server.get_tile_geometry(*synthetic_raster, z, x, leaflet_y(z, y))
+        assert geometry.at_top_edge and geometry.at_bottom_edge and geometry.at_right_edge
+
+        # The data rows start at the raster's top and end at its bottom, to the nearest output pixel
+        tile_bounds = mercantile.xy_bounds(x, y, z)
+        pixel_size = (tile_bounds.top - tile_bounds.bottom) / 256
+        raster_left, raster_bottom, raster_right, raster_top = rasterio.transform.array_bounds(
+            RASTER_HEIGHT, RASTER_WIDTH, RASTER_TRANSFORM
+        )
+        assert abs(geometry.y_offset - (tile_bounds.top - raster_top) / pixel_size) <= 1
+        assert abs(geometry.y_offset + geometry.output_height - (tile_bounds.top - raster_bottom) / pixel_size) <= 1
+        assert abs(geometry.output_width - (raster_right - tile_bounds.left) / pixel_size) <= 1
+
+    def test_upsampled_outside_mask_matches_rasterized_mask(self, tile_server, synthetic_raster):
+        # A zoom 10 tile across the state's western border covers fewer raster pixels than output pixels
+        z, x, y = 10, 201, 409
+        geometry = tile_server.get_tile_geometry(*synthetic_raster, z, x, leaflet_y(z, y))
+        assert geometry.window.width < geometry.output_width
+
+        outside_mask = tile_server.get_tile_outside_mask(*synthetic_raster, z, x, leaflet_y(z, y))
+        expected = rasterized_outside_mask(tile_server, z, x, y, geometry)
+        assert outside_mask.any() and not outside_mask.all()
+        np.testing.assert_array_equal(outside_mask, expected)
+
+    @pytest.mark.parametrize("z,x,y", [(6, 12, 25), (4, 3, 6)])
+    def test_downsampled_outside_mask_matches_rasterized_mask(self, tile_server, synthetic_raster, z, x, y):
+        geometry = tile_server.get_tile_geometry(*synthetic_raster, z, x, leaflet_y(z, y))
+        assert geometry.window.width > geometry.output_width
+
+        outside_mask = tile_server.get_tile_outside_mask(*synthetic_raster, z, x, leaflet_y(z, y))
+        expected = rasterized_outside_mask(tile_server, z, x, y, geometry)
+        assert outside_mask.shape == expected.shape
+        assert not outside_mask.flags.writeable
+
+        # Sampling the native grid can only disagree with the tile resolution mask along the border
+        mismatched = outside_mask != expected
+        assert mismatched.mean() < 0.01
+        assert not (mismatched & ~near_boundary(expected)).any()
+
+
+@pytest.mark.unit
+class TestCountyStats:
+    def test_labelled_reduction_matches_per_county_masks(self, tile_server, tmp_path, monkeypatch):
+        transform = from_origin(-11800000, 4000000, 1000, 1000)
+        rng = np.random.default_rng(0)
+        data = rng.uniform(0, 200, size=(80, 100)).astype(np.float32)
+        data[rng.random(data.shape) < 0.1] = np.nan
+        # The third county only covers nodata
+        data[50:70, 60:90] = np.nan
+        path = write_float_geotiff(tmp_path / "county_stats.tif", data, transform=transform, crs="EPSG:3857")
+
+        county_geoms = [
+            mapping(box(-11795500, 3950500, -11770500, 3990500)),
+            mapping(box(-11760000, 3955000, -11705000, 3975000)),
+            mapping(box(-11738000, 3931000, -11712000, 3948000)),
+        ]
+        counties = [{"properties": {"id": i, "NAMELSAD": f"County {i}"}} for i in range(len(county_geoms))]
+        monkeypatch.setattr(tile_server, "get_counties", lambda: counties)
+        monkeypatch.setattr(tile_server, "get_county_geoms_3857", lambda: county_geoms)
+        tile_server.get_county_labels.cache_clear()
+
+        try:
+            county_stats = tile_server.get_county_stats(str(path), data)
+        finally:
+            tile_server.get_county_labels.cache_clear()
+
+        assert [stats["name"] for stats in county_stats] == ["County 0", "County 1", "County 2"]
+        for county_geom, stats in zip(county_geoms[:2], county_stats[:2]):
+            inside = geometry_mask([county_geom], out_shape=data.shape, transform=transform, invert=True)
+            values = data[inside & ~np.isnan(data)].astype(np.float64)
+            assert len(values) > 0
+            assert stats["mean"] == pytest.approx(values.mean())
+            assert stats["std_dev"] == pytest.approx(values.std())
+
+        # A county without valid pixels has no mean rather than a mean of 0
+        assert np.isnan(county_stats[2]["mean"])
+        assert np.isnan(county_stats[2]["std_dev"])
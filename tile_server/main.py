@@ -1,23 +1,32 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from rasterio.io import MemoryFile
 from rasterio.warp import transform_geom
-from rasterio.features import geometry_mask
-from rasterio.transform import from_bounds
+from rasterio.features import geometry_mask, rasterize
+from rasterio.transform import Affine, from_bounds
 import rasterio
+import asyncio
+import io
 import os
 import re
 import datetime
+import threading
+import time as time_module
 import mercantile
 import shapely
 import json
 from rasterio.windows import Window
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
+from PIL import Image
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from typing import Dict, List, Tuple, Optional, Union
+from typing import Dict, List, NamedTuple, Tuple, Optional, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 load_dotenv()
 
@@ -39,11 +48,123 @@ BUCKET_PREFIX = os.environ.get("MODIS_S3_BUCKET_PREFIX", "modis/")
 AWS_PROFILE = os.environ.get("AWS_PROFILE", None)
 S3_INPUT_BUCKET = os.environ.get("S3_INPUT_BUCKET", "ose-dev-inputs")
 
+# Color limits are computed on a decimated read (every Nth pixel per axis) to avoid decoding the full mosaic per
+# request; the county statistics always use the full-resolution band
+STATS_DOWNSAMPLE_FACTOR = max(1, int(os.environ.get("STATS_DOWNSAMPLE_FACTOR", 16)))
+# GDAL decoding threads for the whole-band statistics reads only; tile reads are small and already run concurrently
+STATS_READ_THREADS = os.environ.get("STATS_READ_THREADS", "ALL_CPUS")
+
+# Connections kept open by the shared S3 client, which is used from many worker threads at once
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 64))
+
+# Seconds to reuse a date listing before scanning the local directory and S3 bucket again
+DATES_CACHE_TTL = float(os.environ.get("DATES_CACHE_TTL", 120))
+
+# Maximum number of open GeoTIFF handles kept per thread
+DATASET_CACHE_SIZE = int(os.environ.get("DATASET_CACHE_SIZE", 32))
+
+# Maximum number of tile read windows kept per raster grid and zoom/x/y (a few hundred bytes each)
+TILE_GEOMETRY_CACHE_SIZE = int(os.environ.get("TILE_GEOMETRY_CACHE_SIZE", 65536))
+
+# Maximum number of decoded band tiles kept in memory across requests (~256 KB each)
+TILE_CACHE_SIZE = int(os.environ.get("TILE_CACHE_SIZE", 1024))
+
+# zlib level for dynamic tile PNGs (0-9)
+PNG_COMPRESS_LEVEL = int(os.environ.get("PNG_COMPRESS_LEVEL", 1))
+
+# Threads for colouring and encoding dynamic tiles, kept apart from the default executor used for raster reads
+TILE_RENDER_WORKERS = int(os.environ.get("TILE_RENDER_WORKERS", (os.cpu_count() or 1) * 2))
+
+# Threads for downloading missing merged bands from S3; ESI needs two bands per date
+BAND_DOWNLOAD_WORKERS = int(os.environ.get("BAND_DOWNLOAD_WORKERS", 4))
+
 BANDS = ["ET", "PET", "ESI"]
 TILE_SIZE = 256
 ET_COLORMAP = LinearSegmentedColormap.from_list("ET", ["#f6e8c3", "#d8b365", "#99974a", "#53792d", "#6bdfd2", "#1839c5"])
 DIFF_COLORMAP = LinearSegmentedColormap.from_list("DIFF", ["#d7191c", "#fdae61", "#ffffbf", "#a6d96a", "#1a9641"])
 
+# Index of the transparent entry appended to each colormap lookup table
+NODATA_LUT_INDEX = 256
+
+
+def bake_colormap_lut(colormap: LinearSegmentedColormap) -> np.ndarray:
+    """Bake a colormap into 256 uint8 RGBA entries plus a transparent entry for nodata pixels."""
+    lut = colormap(np.arange(256), bytes=True)
+    nodata_color = lut[0].copy()
+    nodata_color[3] = 0
+    return np.vstack([lut, nodata_color])
+
+
+ET_LUT = bake_colormap_lut(ET_COLORMAP)
+DIFF_LUT = bake_colormap_lut(DIFF_COLORMAP)
+
+
+def load_nm_boundary() -> Optional[Dict]:
+    """Load the New Mexico boundary and reproject it from EPSG:4326 to EPSG:3857."""
+    try:
+        with open("rois/nm.json", "r") as nm_shape:
+            nm = json.load(nm_shape)
+    except Exception as e:
+        print(f"Failed to load New Mexico boundary: {e}")
+        return None
+
+    return transform_geom("EPSG:4326", "EPSG:3857", nm["features"][0]["geometry"], precision=6)
+
+
+# New Mexico boundary in Web Mercator, prepared so intersects() hits an indexed polygon
+NM_GEOM3857 = load_nm_boundary()
+NM_POLY = shapely.geometry.shape(NM_GEOM3857) if NM_GEOM3857 else None
+NM_BBOX = NM_POLY.bounds if NM_POLY else None
+if NM_POLY:
+    shapely.prepare(NM_POLY)
+
+
+@lru_cache(maxsize=4)
+def get_outside_nm_mask(height: int, width: int, transform: Affine) -> np.ndarray:
+    """Rasterize the New Mexico boundary once per raster grid, True outside the state."""
+    outside_mask = geometry_mask([NM_GEOM3857], out_shape=(height, width), transform=transform)
+    outside_mask.setflags(write=False)
+    return outside_mask
+
+
+TILE_RENDER_POOL = ThreadPoolExecutor(max_workers=TILE_RENDER_WORKERS, thread_name_prefix="tile-render")
+BAND_DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=BAND_DOWNLOAD_WORKERS, thread_name_prefix="band-download")
+
+# Per-thread LRU of open datasets; GDAL handles must not be shared between threads
+_dataset_cache = threading.local()
+
+
+def open_dataset(path: str) -> rasterio.io.DatasetReader:
+    """Open a GeoTIFF through a per-thread LRU of handles keyed by (path, mtime).
+
+    The returned dataset is owned by the cache and must not be closed by the caller.
+    """
+    datasets = getattr(_dataset_cache, "datasets", None)
+    if datasets is None:
+        datasets = _dataset_cache.datasets = OrderedDict()
+
+    # Including the mtime reopens files that were replaced by the pipeline
+    key = (path, os.path.getmtime(path))
+    src = datasets.get(key)
+    if src is not None:
+        datasets.move_to_end(key)
+        return src
+
+    src = rasterio.open(path)
+    datasets[key] = src
+    if len(datasets) > DATASET_CACHE_SIZE:
+        _, evicted = datasets.popitem(last=False)
+        evicted.close()
+    return src
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """Get the shared S3 client; clients are thread-safe, unlike the sessions that create them."""
+    return boto3.Session(profile_name=AWS_PROFILE).client(
+        "s3", config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+    )
+
 
 def validate_band(band: str) -> None:
     """Validate that the band is supported."""
@@ -62,32 +183,70 @@ def get_time_str(time: str) -> str:
     return datetime.datetime.strptime(time, "%Y-%m-%d").strftime("%Y%m%d")
 
 
+def get_date_str(raw_date: str) -> str:
+    """Convert YYYYMMDD to YYYY-MM-DD format."""
+    return f"{raw_date[:4]}-{raw_date[4:6]}-{raw_date[6:8]}"
+
+
 def get_required_bands(band: str) -> List[str]:
     """Get the list of bands required for the given band type."""
     return ["ET", "PET"] if band == "ESI" else [band]
 
 
-def load_band_data(data_product: str, time_str: str, bands: List[str]) -> Dict[str, np.ndarray]:
-    """Load band data from local files or S3."""
+def get_band_path(data_product: str, time_str: str, band: str) -> str:
+    """Get the local path of a merged band GeoTIFF."""
+    return os.path.join(ET_PROCESSED_DIR, f"{data_product}_MERGED_{time_str}_{band}.tif")
+
+
+def get_band_statistics(path: str) -> Optional[Dict[str, float]]:
+    """Read the STATISTICS_* tags precomputed by the MODIS pipeline, if present."""
+    tags = open_dataset(path).tags(1)
+    try:
+        return {key: float(tags[f"STATISTICS_{key.upper()}"]) for key in ("minimum", "maximum", "mean", "stddev")}
+    except (KeyError, ValueError):
+        return None
+
+
+def download_band(data_product: str, time_str: str, band: str) -> None:
+    """Download a merged band GeoTIFF from S3, raising a 404 if it is not available."""
+    path = get_band_path(data_product, time_str, band)
+    key = f"{BUCKET_PREFIX}{data_product}_MERGED_{time_str}_{band}.tif"
+    # Download beside the target and rename, so concurrent requests never open a partial file
+    part_path = f"{path}.{threading.get_ident()}.part"
+    try:
+        get_s3_client().download_file(S3_INPUT_BUCKET, key, part_path)
+        os.replace(part_path, path)
+    except Exception as e:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        # Only a missing object is a missing tile; credentials, throttling and network errors surface as such
+        if isinstance(e, ClientError) and e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            raise HTTPException(status_code=404, detail="Tile not found") from e
+        raise
+
+
+def load_band_data(
+    data_product: str, time_str: str, bands: List[str], downsample_factor: int = 1
+) -> Dict[str, np.ndarray]:
+    """Load band data from local files or S3, optionally decimated by downsample_factor per axis."""
+    missing_bands = [band for band in bands if not os.path.exists(get_band_path(data_product, time_str, band))]
+    if missing_bands:
+        if not S3_INPUT_BUCKET:
+            raise HTTPException(status_code=404, detail="Tile not found")
+        # ESI needs both ET and PET, so overlap their downloads
+        list(BAND_DOWNLOAD_POOL.map(lambda band: download_band(data_product, time_str, band), missing_bands))
+
     band_data = {}
     for band in bands:
-        path = os.path.join(ET_PROCESSED_DIR, f"{data_product}_MERGED_{time_str}_{band}.tif")
-
-        if not os.path.exists(path):
-            if S3_INPUT_BUCKET:
-                s3 = boto3.Session(profile_name=AWS_PROFILE).client("s3")
-                key = f"{BUCKET_PREFIX}{data_product}_MERGED_{time_str}_{band}.tif"
-                try:
-                    s3.download_file(S3_INPUT_BUCKET, key, path)
-                except Exception as e:
-                    raise HTTPException(status_code=404, detail="Tile not found")
-            else:
-                raise HTTPException(status_code=404, detail="Tile not found")
-
-        with rasterio.open(path) as src:
-            data = src.read(1)
-            # Filter out nodata values
-            band_data[band] = np.where(data >= 32700, np.nan, data)
+        path = get_band_path(data_product, time_str, band)
+        src = open_dataset(path)
+        out_shape = (max(1, src.height // downsample_factor), max(1, src.width // downsample_factor))
+        # Nearest keeps nodata pixels intact; GDAL serves the read from internal overviews when present
+        with rasterio.Env(GDAL_NUM_THREADS=STATS_READ_THREADS):
+            data = src.read(1, out_shape=out_shape, resampling=rasterio.enums.Resampling.nearest, out_dtype=np.float32)
+        # Filter out nodata values in place rather than promoting to a new array
+        data[data >= 32700] = np.nan
+        band_data[band] = data
 
     return band_data
 
@@ -95,8 +254,11 @@ def load_band_data(data_product: str, time_str: str, bands: List[str]) -> Dict[s
 def calculate_band_values(band: str, band_data: Dict[str, np.ndarray]) -> np.ndarray:
     """Calculate the final band values, handling ESI calculation if needed."""
     if band == "ESI":
-        values = np.divide(band_data["ET"], band_data["PET"])
-        return np.clip(values, 0, 1)
+        et, pet = band_data["ET"], band_data["PET"]
+        # ESI is undefined without positive PET; leave those pixels as nodata instead of dividing by zero
+        values = np.full(et.shape, np.nan, dtype=np.result_type(et, pet))
+        np.divide(et, pet, out=values, where=pet > 0)
+        return np.clip(values, 0, 1, out=values)
     return band_data[band]
 
 
@@ -119,17 +281,21 @@ def calculate_difference(current_data: np.ndarray, prev_data: np.ndarray, esi_mo
 
 
 def get_color_limits(
-    data: np.ndarray, esi_mode: bool, comparison_mode: str, use_std_dev: bool = False
+    data: np.ndarray,
+    esi_mode: bool,
+    comparison_mode: str,
+    use_std_dev: bool = False,
+    statistics: Optional[Dict[str, float]] = None,
 ) -> Tuple[float, float]:
-    """Get the color limits for visualization."""
+    """Get the color limits for visualization, using precomputed band statistics when provided."""
     if use_std_dev:
-        mean = np.nanmean(data)
-        std_dev = np.nanstd(data)
+        mean = statistics["mean"] if statistics else np.nanmean(data)
+        std_dev = statistics["stddev"] if statistics else np.nanstd(data)
         min_val = np.max([0, mean - 2 * std_dev])
         max_val = mean + 2 * std_dev
     else:
-        min_val = np.max([0, np.nanmin(data)])
-        max_val = np.nanmax(data)
+        min_val = np.max([0, statistics["minimum"] if statistics else np.nanmin(data)])
+        max_val = statistics["maximum"] if statistics else np.nanmax(data)
 
     if comparison_mode == "absolute":
         if esi_mode:
@@ -145,209 +311,270 @@ def get_color_limits(
 
 def create_rgba_tile(data: np.ndarray, min_val: float, max_val: float, comparison_mode: str) -> np.ndarray:
     """Create an RGBA tile from the data."""
-    # Create alpha channel
-    alpha = np.where(np.isnan(data), 0, 255).astype(np.uint8)
-
-    # Scale data to 0-255 range
+    # Scale data to 0-255 range in one float32 buffer
     if max_val - min_val > 0:
-        scaled_data = np.clip(((data - min_val) / (max_val - min_val) * 255), 0, 255)
+        scaled_data = np.subtract(data, min_val, dtype=np.float32)
+        scaled_data *= 255 / (max_val - min_val)
+        np.clip(scaled_data, 0, 255, out=scaled_data)
     else:
-        scaled_data = np.zeros_like(data)
+        scaled_data = np.zeros_like(data, dtype=np.float32)
 
-    scaled_data = np.nan_to_num(scaled_data, nan=0).astype(np.uint8)
-    colormap = ET_COLORMAP if comparison_mode == "absolute" else DIFF_COLORMAP
-    colored_data = colormap(scaled_data)
-    rgb_data = (colored_data[:, :, :3] * 255).astype(np.uint8)
+    nodata = np.isnan(data)
+    scaled_data[nodata] = 0
+    indices = scaled_data.astype(np.uint16)
+    # Point nodata pixels at the transparent entry so the gather also writes the alpha channel
+    indices[nodata] = NODATA_LUT_INDEX
+    lut = ET_LUT if comparison_mode == "absolute" else DIFF_LUT
+    # Gather straight into the contiguous RGBA buffer; the indices are always in range, so skip bounds checking
+    rgba_tile = np.empty(indices.shape + (4,), dtype=np.uint8)
+    np.take(lut, indices, axis=0, out=rgba_tile, mode="clip")
 
-    # Create RGBA tile
-    return np.dstack([rgb_data, alpha])
+    return rgba_tile
 
 
-@app.get("/ts_v1/tiles/{data_product}/dates")
-async def get_dates(data_product: str):
+def encode_png(rgba_tile: np.ndarray) -> bytes:
+    """Encode an RGBA tile as PNG; a low zlib level keeps encoding fast at a small cost in size."""
+    buffer = io.BytesIO()
+    Image.fromarray(rgba_tile, "RGBA").save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=32)
+def get_merged_tiff_pattern(data_product: str) -> re.Pattern:
+    """Compile the pattern matching merged band GeoTIFF names, with or without the S3 bucket prefix."""
+    return re.compile(rf"(?:{re.escape(BUCKET_PREFIX)})?{re.escape(data_product)}_MERGED_(\d{{8}})_.+\.tif")
+
+
+def list_dates(data_product: str) -> List[str]:
+    """List the available MODIS dates from the local directory and the S3 bucket."""
     if not os.path.exists(ET_PROCESSED_DIR):
         os.makedirs(ET_PROCESSED_DIR, exist_ok=True)
 
-    # Return a list of available MODIS dates
-    dates = []
+    pattern = get_merged_tiff_pattern(data_product)
+
+    # Collect the raw YYYYMMDD dates; they sort the same as the formatted ones, so formatting waits until the end
+    raw_dates = set()
     for tiff_file in os.listdir(ET_PROCESSED_DIR):
-        matches = re.match(rf"{data_product}_MERGED_(\d{{8}})_.+\.tif", tiff_file)
-        if not matches:
-            continue
-        raw_date = matches.group(1)
-        formatted_date = datetime.datetime.strptime(raw_date, "%Y%m%d").strftime("%Y-%m-%d")
-        if formatted_date not in dates:
-            dates.append(formatted_date)
+        matches = pattern.match(tiff_file)
+        if matches:
+            raw_dates.add(matches.group(1))
 
     # Now check the S3 bucket
     if S3_INPUT_BUCKET:
         try:
-            session = boto3.Session(profile_name=AWS_PROFILE)
-            s3 = session.client("s3")
+            s3 = get_s3_client()
             paginator = s3.get_paginator("list_objects_v2")
             pages = paginator.paginate(Bucket=S3_INPUT_BUCKET, Prefix=BUCKET_PREFIX)
 
             for response in pages:
                 for obj in response.get("Contents", []):
-                    key = obj["Key"]
-                    matches = re.match(rf"{BUCKET_PREFIX}{data_product}_MERGED_(\d{{8}})_.+\.tif", key)
-                    if not matches:
-                        continue
-                    raw_date = matches.group(1)
-                    formatted_date = datetime.datetime.strptime(raw_date, "%Y%m%d").strftime("%Y-%m-%d")
-                    if formatted_date not in dates:
-                        dates.append(formatted_date)
+                    matches = pattern.match(obj["Key"])
+                    if matches:
+                        raw_dates.add(matches.group(1))
         except Exception as e:
             print("Error checking S3 bucket for MODIS dates", e)
 
-    dates.sort()
+    return [get_date_str(raw_date) for raw_date in sorted(raw_dates)]
 
-    return dates
 
+# Date listings per data product as (timestamp, dates); the lock keeps concurrent tiles from all listing S3 at once
+_dates_cache: Dict[str, Tuple[float, List[str]]] = {}
+_dates_lock = asyncio.Lock()
 
-def get_tile(path: str, z: int, x: int, y: int):
-    """Get a tile from a GeoTIFF file."""
-    # Load New Mexico boundary
-    try:
-        with open("rois/nm.json", "r") as nm_shape:
-            nm = json.load(nm_shape)
-    except Exception as e:
-        print(f"Failed to load New Mexico boundary: {e}")
+
+@app.get("/ts_v1/tiles/{data_product}/dates")
+async def get_dates(data_product: str):
+    async with _dates_lock:
+        cached = _dates_cache.get(data_product)
+        if cached and time_module.monotonic() - cached[0] < DATES_CACHE_TTL:
+            return cached[1]
+
+        dates = await asyncio.to_thread(list_dates, data_product)
+        _dates_cache[data_product] = (time_module.monotonic(), dates)
+        return dates
+
+
+def get_tile(path: str, z: int, x: int, y: int) -> Optional[np.ndarray]:
+    """Get a tile from a GeoTIFF file, reusing the decoded tile while the file is unchanged.
+
+    The returned array is shared between requests and is read-only.
+    """
+    # Most tiles around the state never need the GeoTIFF, so reject them before touching the file
+    if not tile_intersects_nm(z, x, y):
         return None
+    return get_cached_tile(path, os.path.getmtime(path), z, x, y)
 
-    nm_geom4326 = nm["features"][0]["geometry"]
 
-    # reproject from 4326 to 3857
-    nm_geom3857 = transform_geom(
-        "EPSG:4326",
-        "EPSG:3857",
-        nm_geom4326,
-        precision=6,
-    )
+def tile_intersects_nm(z: int, x: int, y: int) -> bool:
+    """Check whether a Leaflet tile intersects the New Mexico boundary."""
+    if NM_POLY is None:
+        return False
+
+    x_min, y_min, x_max, y_max = mercantile.xy_bounds(x, (2**z - 1) - y, z)
+
+    # Cheap bounding box rejection before the full polygon test
+    if x_max < NM_BBOX[0] or x_min > NM_BBOX[2] or y_max < NM_BBOX[1] or y_min > NM_BBOX[3]:
+        return False
+
+    return shapely.intersects(NM_POLY, shapely.box(x_min, y_min, x_max, y_max))
+
+
+@lru_cache(maxsize=TILE_CACHE_SIZE)
+def get_cached_tile(path: str, mtime: float, z: int, x: int, y: int) -> Optional[np.ndarray]:
+    """Read a tile once per (path, mtime); the mtime is only part of the cache key."""
+    tile = read_tile(path, z, x, y)
+    if tile is not None:
+        tile.setflags(write=False)
+    return tile
+
+
+class TileGeometry(NamedTuple):
+    """Where a tile falls on a raster grid and where its data lands in the TILE_SIZE x TILE_SIZE output."""
+
+    window: Window
+    output_height: int
+    output_width: int
+    y_offset: int
+    at_top_edge: bool
+    at_bottom_edge: bool
+    at_right_edge: bool
+
 
-    # build a Shapely polygon in Web Mercator
-    nm_poly = shapely.geometry.shape(nm_geom3857)
-
-    with rasterio.open(path) as src:
-        # Convert Leaflet Y to TMS Y
-        tms_y = (2**z - 1) - y
-
-        # Get tile bounds in mercator coordinates
-        tile_bounds = mercantile.xy_bounds(x, tms_y, z)
-        x_min, y_min, x_max, y_max = tile_bounds
-
-        # Check if tile intersects with raster
-        raster_bounds = src.bounds
-        if (
-            x_max < raster_bounds.left
-            or x_min > raster_bounds.right
-            or y_max < raster_bounds.bottom
-            or y_min > raster_bounds.top
-        ):
+@lru_cache(maxsize=TILE_GEOMETRY_CACHE_SIZE)
+def get_tile_geometry(transform: Affine, width: int, height: int, z: int, x: int, y: int) -> Optional[TileGeometry]:
+    """Compute the read window and output placement of a tile on a raster grid, or None if they do not overlap."""
+    # Convert Leaflet Y to TMS Y
+    tms_y = (2**z - 1) - y
+
+    # Get tile bounds in mercator coordinates
+    tile_bounds = mercantile.xy_bounds(x, tms_y, z)
+    x_min, y_min, x_max, y_max = tile_bounds
+
+    # Check if tile intersects with raster
+    raster_bounds = rasterio.transform.array_bounds(height, width, transform)
+    raster_left, raster_bottom, raster_right, raster_top = raster_bounds
+    if x_max < raster_left or x_min > raster_right or y_max < raster_bottom or y_min > raster_top:
+        return None
+
+    # Convert bounds to pixel coordinates
+    px_min, py_max = ~transform * (x_min, y_min)
+    px_max, py_min = ~transform * (x_max, y_max)
+
+    # Round and clamp to valid pixel coordinates
+    row_min = max(0, min(height - 1, int(round(py_min))))
+    row_max = max(0, min(height - 1, int(round(py_max))))
+    col_min = max(0, min(width - 1, int(round(px_min))))
+    col_max = max(0, min(width - 1, int(round(px_max))))
+
+    # Check if we're at the edge of the raster
+    at_bottom_edge = py_max >= height - 1
+    at_top_edge = py_min <= 0
+    at_right_edge = px_max >= width - 1
+
+    # Create window
+    window = Window.from_slices((row_min, row_max), (col_min, col_max))
+
+    # Calculate the rows of the tile that actually contain data
+    tile_mercator_height = tile_bounds.top - tile_bounds.bottom
+    y_offset = 0
+    output_height = TILE_SIZE
+    if at_top_edge:
+        # The raster starts below the top of the tile
+        data_mercator_height = raster_top - tile_bounds.bottom
+        if data_mercator_height <= 0:
             return None
 
-        tile_poly = shapely.geometry.box(x_min, y_min, x_max, y_max)
-        # Check if tile_bounds intersects with New Mexico boundary
-        if not tile_poly.intersects(nm_poly):
+        output_height = int((data_mercator_height / tile_mercator_height) * TILE_SIZE)
+        output_height = max(1, min(output_height, TILE_SIZE))
+        y_offset = TILE_SIZE - output_height
+    if at_bottom_edge:
+        # The raster ends above the bottom of the tile; low zoom tiles can cover both edges
+        data_mercator_height = tile_bounds.top - raster_bottom
+        if data_mercator_height <= 0:
             return None
 
-        # Convert bounds to pixel coordinates
-        px_min, py_max = ~src.transform * (x_min, y_min)
-        px_max, py_min = ~src.transform * (x_max, y_max)
-
-        # Round and clamp to valid pixel coordinates
-        row_min = max(0, min(src.height - 1, int(round(py_min))))
-        row_max = max(0, min(src.height - 1, int(round(py_max))))
-        col_min = max(0, min(src.width - 1, int(round(px_min))))
-        col_max = max(0, min(src.width - 1, int(round(px_max))))
-
-        # Check if we're at the edge of the raster
-        at_bottom_edge = py_max >= src.height - 1
-        at_top_edge = py_min <= 0
-        at_right_edge = px_max >= src.width - 1
-
-        # Create window
-        window = Window.from_slices((row_min, row_max), (col_min, col_max))
-
-        y_offset = 0
-
-        # Calculate the actual height we should read based on the data available
-        if at_bottom_edge:
-            # Calculate what portion of the tile should actually contain data
-            tile_mercator_height = tile_bounds.top - tile_bounds.bottom
-            data_mercator_height = tile_bounds.top - raster_bounds.bottom
-            if data_mercator_height <= 0:
-                return None
-
-            # Calculate proportional output height
-            output_height = int((data_mercator_height / tile_mercator_height) * TILE_SIZE)
-            output_height = max(1, min(output_height, TILE_SIZE))
-        elif at_top_edge:
-            # Calculate proportion for top edge
-            tile_mercator_height = tile_bounds.top - tile_bounds.bottom
-            data_mercator_height = raster_bounds.top - tile_bounds.bottom
-            if data_mercator_height <= 0:
-                return None
-
-            output_height = int((data_mercator_height / tile_mercator_height) * TILE_SIZE)
-            output_height = max(1, min(output_height, TILE_SIZE))
-            y_offset = TILE_SIZE - output_height
-        else:
-            output_height = TILE_SIZE
-
-        output_width = TILE_SIZE
-        if at_right_edge:
-            # Calculate proportion for right edge
-            tile_mercator_width = tile_bounds.right - tile_bounds.left
-            data_mercator_width = raster_bounds.right - tile_bounds.left
-            if data_mercator_width <= 0:
-                return None
-
-            output_width = int((data_mercator_width / tile_mercator_width) * TILE_SIZE)
-            output_width = max(1, min(output_width, TILE_SIZE))
-
-        resampling_method = rasterio.enums.Resampling.rms
-        if z > 9:
-            resampling_method = rasterio.enums.Resampling.cubic_spline
-
-        # Read and resample data
-        data = src.read(1, window=window, out_shape=(output_height, output_width), resampling=resampling_method)
-
-        full_data = np.full((TILE_SIZE, TILE_SIZE), np.nan)
-
-        tile_transform = from_bounds(x_min, y_min, x_max, y_max, width=TILE_SIZE, height=TILE_SIZE)
-
-        if at_top_edge:
-            if at_right_edge:
-                full_data[y_offset:, :output_width] = data
-            else:
-                full_data[y_offset:, :] = data
-        elif at_bottom_edge:
-            if at_right_edge:
-                full_data[:output_height, :output_width] = data
-            else:
-                full_data[:output_height, :] = data
-        elif at_right_edge:
-            full_data[:, :output_width] = data
-        else:
-            full_data = data
-
-        # Handle nodata values
-        nodata_value = 32700
-        full_data = np.where(full_data >= nodata_value, np.nan, full_data)
-
-        mask = geometry_mask(
-            [nm_geom3857],
-            out_shape=(TILE_SIZE, TILE_SIZE),
-            transform=tile_transform,
-            invert=True,
+        data_bottom = int((data_mercator_height / tile_mercator_height) * TILE_SIZE)
+        data_bottom = max(1, min(data_bottom, TILE_SIZE))
+        output_height = max(1, data_bottom - y_offset)
+
+    output_width = TILE_SIZE
+    if at_right_edge:
+        # Calculate proportion for right edge
+        tile_mercator_width = tile_bounds.right - tile_bounds.left
+        data_mercator_width = raster_right - tile_bounds.left
+        if data_mercator_width <= 0:
+            return None
+
+        output_width = int((data_mercator_width / tile_mercator_width) * TILE_SIZE)
+        output_width = max(1, min(output_width, TILE_SIZE))
+
+    return TileGeometry(window, output_height, output_width, y_offset, at_top_edge, at_bottom_edge, at_right_edge)
+
+
+@lru_cache(maxsize=TILE_CACHE_SIZE)
+def get_tile_outside_mask(transform: Affine, width: int, height: int, z: int, x: int, y: int) -> np.ndarray:
+    """Get the read-only mask, True outside New Mexico, covering the data portion of a tile on a raster grid."""
+    geometry = get_tile_geometry(transform, width, height, z, x, y)
+    window, output_height, output_width = geometry.window, geometry.output_height, geometry.output_width
+
+    if output_height > window.height or output_width > window.width:
+        # Upsampled tiles are finer than the raster, so rasterize the boundary at tile resolution to keep it smooth
+        tile_transform = from_bounds(*mercantile.xy_bounds(x, (2**z - 1) - y, z), width=TILE_SIZE, height=TILE_SIZE)
+        outside_mask = geometry_mask(
+            [NM_GEOM3857],
+            out_shape=(output_height, output_width),
+            transform=tile_transform * Affine.translation(0, geometry.y_offset),
         )
+    else:
+        # Sample the native-grid NM mask at the same pixel centres a nearest read of the window would use
+        outside_window = get_outside_nm_mask(height, width, transform)[window.toslices()]
+        mask_rows = ((np.arange(output_height) + 0.5) * (outside_window.shape[0] / output_height)).astype(np.intp)
+        mask_cols = ((np.arange(output_width) + 0.5) * (outside_window.shape[1] / output_width)).astype(np.intp)
+        outside_mask = outside_window[np.ix_(mask_rows, mask_cols)]
+
+    outside_mask.setflags(write=False)
+    return outside_mask
+
+
+def read_tile(path: str, z: int, x: int, y: int) -> Optional[np.ndarray]:
+    """Read a tile from a GeoTIFF file; callers are expected to have checked tile_intersects_nm."""
+    src = open_dataset(path)
+
+    geometry = get_tile_geometry(src.transform, src.width, src.height, z, x, y)
+    if geometry is None:
+        return None
+    window, output_height, output_width, y_offset, at_top_edge, at_bottom_edge, at_right_edge = geometry
+
+    resampling_method = rasterio.enums.Resampling.rms
+    if z > 9:
+        resampling_method = rasterio.enums.Resampling.cubic_spline
+    elif not src.overviews(1) and window.width > 4 * output_width:
+        # Without internal overviews a heavily downsampled rms read decodes the whole window;
+        # nearest lets GDAL skip the rows and blocks it does not sample
+        resampling_method = rasterio.enums.Resampling.nearest
+
+    if at_top_edge or at_bottom_edge or at_right_edge:
+        # Only edge tiles are partially covered and need a nan-filled canvas
+        full_data = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    else:
+        full_data = np.empty((TILE_SIZE, TILE_SIZE), dtype=np.float32)
+    data = full_data[y_offset : y_offset + output_height, :output_width]
+
+    # Read and resample straight into the tile; the source is already in EPSG:3857, so this is a plain
+    # GDAL RasterIO resample, not a warp
+    src.read(1, window=window, out=data, resampling=resampling_method)
 
-        full_data[~mask] = np.nan
+    # Handle nodata values
+    nodata_value = 32700
+    data[data >= nodata_value] = np.nan
 
-        return full_data
+    outside_mask = get_tile_outside_mask(src.transform, src.width, src.height, z, x, y)
+    np.putmask(data, outside_mask, np.nan)
 
+    return full_data
 
+
+@lru_cache(maxsize=1)
 def get_counties() -> List[Dict[str, str]]:
     """Get the list of counties in New Mexico."""
     with open("rois/nm_counties.json", "r") as f:
@@ -355,6 +582,62 @@ def get_counties() -> List[Dict[str, str]]:
         return counties["features"]
 
 
+@lru_cache(maxsize=1)
+def get_county_geoms_3857() -> List[Dict]:
+    """Get the county geometries reprojected from EPSG:4326 to EPSG:3857."""
+    return transform_geom(
+        "EPSG:4326",
+        "EPSG:3857",
+        [county["geometry"] for county in get_counties()],
+        precision=6,
+    )
+
+
+@lru_cache(maxsize=8)
+def get_county_labels(out_shape: Tuple[int, int], transform: Affine) -> np.ndarray:
+    """Rasterize the counties onto the given grid as one read-only label image: 0 outside, i + 1 in county i."""
+    county_labels = rasterize(
+        ((county_geom_3857, i + 1) for i, county_geom_3857 in enumerate(get_county_geoms_3857())),
+        out_shape=out_shape,
+        transform=transform,
+        fill=0,
+        dtype=np.uint16,
+    )
+    county_labels.setflags(write=False)
+    return county_labels
+
+
+def get_county_stats(path: str, data: np.ndarray) -> List[Dict[str, Union[str, float]]]:
+    """Get the mean and standard deviation of the data within each New Mexico county."""
+    counties = get_counties()
+
+    src = open_dataset(path)
+    # Scale the native transform to the decimated grid of the data
+    transform = src.transform * Affine.scale(src.width / data.shape[1], src.height / data.shape[0])
+
+    # Reduce every county in one labelled pass over the valid pixels instead of masking the raster per county
+    valid = ~np.isnan(data)
+    labels = get_county_labels(data.shape, transform)[valid]
+    values = data[valid].astype(np.float64)
+    n_labels = len(counties) + 1
+
+    counts = np.bincount(labels, minlength=n_labels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.bincount(labels, weights=values, minlength=n_labels) / counts
+        deviations = values - means[labels]
+        std_devs = np.sqrt(np.bincount(labels, weights=deviations * deviations, minlength=n_labels) / counts)
+
+    county_stats = []
+    for i, county in enumerate(counties, start=1):
+        county_name = county["properties"]["NAMELSAD"]
+        mean = float(means[i])
+        std_dev = float(std_devs[i])
+
+        county_stats.append({"id": county["properties"]["id"], "name": county_name, "mean": mean, "std_dev": std_dev})
+
+    return county_stats
+
+
 @app.get("/ts_v1/tiles/stats/{data_product}/{band}/{time}/{comparison_mode}")
 async def get_stats(data_product: str, band: str, time: str, comparison_mode: str = "absolute"):
     """Get statistics for a given band and time."""
@@ -366,11 +649,15 @@ async def get_stats(data_product: str, band: str, time: str, comparison_mode: st
     bands = get_required_bands(band)
 
     # Load current data
-    band_data = load_band_data(data_product, time_str, bands)
+    band_data = await asyncio.to_thread(load_band_data, data_product, time_str, bands, STATS_DOWNSAMPLE_FACTOR)
     current_data = calculate_band_values(band, band_data)
 
     if comparison_mode == "absolute":
-        min_val, max_val = get_color_limits(current_data, esi_mode, comparison_mode, use_std_dev=True)
+        # ESI is derived from two bands, so only single-band requests can use the stored statistics
+        statistics = None if esi_mode else get_band_statistics(get_band_path(data_product, time_str, band))
+        min_val, max_val = get_color_limits(
+            current_data, esi_mode, comparison_mode, use_std_dev=True, statistics=statistics
+        )
     else:
         # Get previous date data
         available_dates = await get_dates(data_product)
@@ -379,45 +666,61 @@ async def get_stats(data_product: str, band: str, time: str, comparison_mode: st
             raise HTTPException(status_code=404, detail="Previous date not found")
 
         prev_time_str = get_time_str(prev_date)
-        prev_band_data = load_band_data(data_product, prev_time_str, bands)
+        prev_band_data = await asyncio.to_thread(
+            load_band_data, data_product, prev_time_str, bands, STATS_DOWNSAMPLE_FACTOR
+        )
         prev_data = calculate_band_values(band, prev_band_data)
 
         diff = calculate_difference(current_data, prev_data, esi_mode)
         min_val, max_val = get_color_limits(diff, esi_mode, comparison_mode, use_std_dev=True)
 
-    counties = get_counties()
-    county_stats = []
+    if STATS_DOWNSAMPLE_FACTOR > 1:
+        # Small counties cover only a few decimated pixels, so their means come from the full-resolution band
+        band_data = await asyncio.to_thread(load_band_data, data_product, time_str, bands)
+        current_data = calculate_band_values(band, band_data)
 
-    with rasterio.open(
-        os.path.join(ET_PROCESSED_DIR, f"{data_product}_MERGED_{time_str}_{list(band_data.keys())[0]}.tif")
-    ) as src:
-        transform = src.transform
+    path = get_band_path(data_product, time_str, list(band_data.keys())[0])
+    county_stats = await asyncio.to_thread(get_county_stats, path, current_data)
 
-    for county in counties:
-        county_name = county["properties"]["NAMELSAD"]
-        county_geom = county["geometry"]
+    return {"min": min_val, "max": max_val, "county_stats": county_stats}
 
-        county_geom_3857 = transform_geom(
-            "EPSG:4326",
-            "EPSG:3857",
-            county_geom,
-            precision=6,
-        )
 
-        county_mask = geometry_mask(
-            [county_geom_3857],
-            out_shape=current_data.shape,
-            transform=transform,
-            invert=True,
-        )
+async def get_band_tiles(
+    data_product: str, time_str: str, bands: List[str], z: int, x: int, y: int
+) -> Optional[Dict[str, np.ndarray]]:
+    """Read the tile for each band in worker threads, returning None if any band has no data."""
+    tiles = await asyncio.gather(
+        *(asyncio.to_thread(get_tile, get_band_path(data_product, time_str, band_name), z, x, y) for band_name in bands)
+    )
 
-        county_data = current_data[county_mask]
-        mean = float(np.nanmean(county_data))
-        std_dev = float(np.nanstd(county_data))
+    band_data = {}
+    for band_name, full_data in zip(bands, tiles):
+        if full_data is None or np.isnan(full_data).all():
+            return None
+        band_data[band_name] = full_data
 
-        county_stats.append({"id": county["properties"]["id"], "name": county_name, "mean": mean, "std_dev": std_dev})
+    return band_data
 
-    return {"min": min_val, "max": max_val, "county_stats": county_stats}
+
+def render_tile(
+    band: str,
+    band_data: Dict[str, np.ndarray],
+    prev_band_data: Optional[Dict[str, np.ndarray]],
+    min_val: float,
+    max_val: float,
+    comparison_mode: str,
+) -> bytes:
+    """Compute the band values, colour them and encode the PNG for a dynamic tile."""
+    current_data = calculate_band_values(band, band_data)
+
+    if prev_band_data is not None:
+        prev_data = calculate_band_values(band, prev_band_data)
+        current_data = calculate_difference(current_data, prev_data, band == "ESI")
+
+    # Create RGBA tile
+    rgba_tile = create_rgba_tile(current_data, min_val, max_val, comparison_mode)
+
+    return encode_png(rgba_tile)
 
 
 @app.get("/ts_v1/tiles/dynamic/{data_product}/{band}/{time}/{z}/{x}/{y}.png")
@@ -441,18 +744,11 @@ async def serve_dynamic_tile(
     bands = get_required_bands(band)
 
     # Load current data
-    band_data = {}
-    for band_name in bands:
-        path = os.path.join(ET_PROCESSED_DIR, f"{data_product}_MERGED_{time_str}_{band_name}.tif")
-        full_data = get_tile(path, z, x, y)
-
-        if full_data is None or np.isnan(full_data).all():
-            return Response(content=b"", media_type="image/png", status_code=404)
-
-        band_data[band_name] = full_data
-
-    current_data = calculate_band_values(band, band_data)
+    band_data = await get_band_tiles(data_product, time_str, bands, z, x, y)
+    if band_data is None:
+        return Response(content=b"", media_type="image/png", status_code=404)
 
+    prev_band_data = None
     if comparison_mode == "prevPass":
         # Get previous date data
         available_dates = await get_dates(data_product)
@@ -461,30 +757,27 @@ async def serve_dynamic_tile(
             return Response(content=b"", media_type="image/png", status_code=404)
 
         prev_time_str = get_time_str(prev_date)
-        prev_band_data = {}
-        for band_name in bands:
-            prev_path = os.path.join(ET_PROCESSED_DIR, f"{data_product}_MERGED_{prev_time_str}_{band_name}.tif")
-            prev_data = get_tile(prev_path, z, x, y)
-            if prev_data is None or np.isnan(prev_data).all():
-                return Response(content=b"", media_type="image/png", status_code=404)
-            prev_band_data[band_name] = prev_data
-
-        prev_data = calculate_band_values(band, prev_band_data)
-        current_data = calculate_difference(current_data, prev_data, esi_mode)
+        prev_band_data = await get_band_tiles(data_product, prev_time_str, bands, z, x, y)
+        if prev_band_data is None:
+            return Response(content=b"", media_type="image/png", status_code=404)
 
     # Set color limits
     min_val = color_min if color_min is not None else (0 if not esi_mode else 0)
     max_val = color_max if color_max is not None else (200 if not esi_mode else 1)
 
-    # Create RGBA tile
-    rgba_tile = create_rgba_tile(current_data, min_val, max_val, comparison_mode)
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(
+        TILE_RENDER_POOL, render_tile, band, band_data, prev_band_data, min_val, max_val, comparison_mode
+    )
+    return Response(content=content, media_type="image/png")
 
-    # Save to PNG
-    with MemoryFile() as memfile:
-        with memfile.open(driver="PNG", height=TILE_SIZE, width=TILE_SIZE, count=4, dtype=np.uint8, nodata=0) as dataset:
-            for i in range(4):
-                dataset.write(rgba_tile[:, :, i], i + 1)
-        return Response(content=memfile.read(), media_type="image/png")
+
+def read_tile_file(path: str) -> Optional[bytes]:
+    """Read a pre-rendered tile from disk, returning None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
 
 
 @app.get("/ts_v1/tiles/static/{band}/{time}/{z}/{x}/{y}.png")
@@ -500,9 +793,9 @@ async def serve_tile(band: str, time: str, z: int, x: int, y: int):
     time_str = datetime.datetime.strptime(time, "%Y-%m-%d").strftime("%Y%m%d")
     path = f"~/data/modis_net_et_8_day/et_tiles/{time_str}/tiles/{z}/{x}/{y}.png"
     path = os.path.expanduser(path)
-    if os.path.exists(path):
-        with open(path, "rb") as f:
-            return Response(content=f.read(), media_type="image/png")
+    content = await asyncio.to_thread(read_tile_file, path)
+    if content is not None:
+        return Response(content=content, media_type="image/png")
     else:
         return Response(content=b"", media_type="image/png", status_code=404)
 
@@ -1,10 +1,12 @@
 import os
 import requests
-from bs4 import BeautifulSoup
 import boto3
 import tqdm
 import re
+from botocore.config import Config
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from fetch_modis_earthdata import download_tile_from_s3, list_all_dates_for_year
 
 # Configuration
@@ -15,6 +17,7 @@ MODIS_BASE_URL = f"https://e4ftl01.cr.usgs.gov/MOLT/{BASE_DATA_PRODUCT}.{DATA_PR
 S3_INPUT_BUCKET = os.getenv("S3_INPUT_BUCKET", "ose-dev-inputs")
 AWS_PROFILE = os.getenv("AWS_PROFILE", None)
 BUCKET_PREFIX = os.getenv("BUCKET_PREFIX", "modis/")
+DOWNLOAD_WORKERS = int(os.getenv("MODIS_DOWNLOAD_WORKERS", 16))
 
 
 def get_env_path(key, default):
@@ -27,39 +30,8 @@ def get_env_path(key, default):
 DOWNLOAD_FOLDER = get_env_path("MODIS_DOWNLOAD_DIR", "/root/data/modis/downloads")
 EXISTING_MERGED_FOLDER = get_env_path("MODIS_MERGED_DIR", "/root/data/modis/raw_et")
 
-
-# def get_available_dates(url=MODIS_BASE_URL):
-#     response = requests.get(url)
-#     response.raise_for_status()
-
-#     soup = BeautifulSoup(response.text, "html.parser")
-#     dates = []
-
-#     for a in soup.find_all("a"):
-#         href = a.get("href")
-#         if href and href.endswith("/"):
-#             potential_date = href.strip("/")
-#             formatted_date = potential_date.replace(".", "")
-#             if formatted_date.isdigit():
-#                 dates.append(potential_date)
-
-#     return dates
-
-
-# *** We're rate limited by HTTP requests, better to use S3
-# def get_files_for_date(date, base_url=MODIS_BASE_URL):
-#     url = f"{base_url}{date}/"
-#     response = requests.get(url)
-#     response.raise_for_status()
-
-#     soup = BeautifulSoup(response.text, "html.parser")
-#     files = []
-
-#     for a in soup.find_all("a"):
-#         href = a.get("href")
-#         if href and not href.endswith("/"):
-#             files.append(href)
-#     return files
+# Ex: MOD16A2_MERGED_20210226_ET.tif
+MERGED_TIF_DATE_PATTERN = re.compile(r"_(\d{8})_")
 
 
 # def download_hdf_file(date, tile):
@@ -74,6 +46,14 @@ EXISTING_MERGED_FOLDER = get_env_path("MODIS_MERGED_DIR", "/root/data/modis/raw_
 #     return download_tile_from_s3(date, tile, dest_folder=DOWNLOAD_FOLDER)
 
 
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """Get the application bucket S3 client, created once so its connection pool stays warm between runs."""
+    return boto3.Session(profile_name=AWS_PROFILE).client(
+        "s3", config=Config(max_pool_connections=50, retries={"max_attempts": 10, "mode": "adaptive"})
+    )
+
+
 def format_date(date_str):
     """Converts a date string from YYYYMMDD to YYYY.MM.DD."""
     return f"{date_str[:4]}.{date_str[4:6]}.{date_str[6:]}"
@@ -85,7 +65,16 @@ def get_date_from_s3_key(key):
     return format_date(re.search(r"\d{8}", product_name).group(0))
 
 
-def fetch_new_dates(limit=None):
+def fetch_new_dates(limit=None, on_download=None):
+    """Download the tiles for dates that are neither merged locally nor in S3.
+
+    Args:
+        limit: Limit the number of dates to download
+        on_download: Optional callback given the path of each file as soon as it is downloaded
+
+    Returns:
+        The dates that were downloaded
+    """
     current_year = datetime.now().year
     available_dates = list_all_dates_for_year(current_year)
 
@@ -93,42 +82,62 @@ def fetch_new_dates(limit=None):
         os.makedirs(EXISTING_MERGED_FOLDER, exist_ok=True)
 
     # Check existing files in local folder first
-    existing_files = os.listdir(EXISTING_MERGED_FOLDER)
-    dates_in_existing_files = [format_date(f.split("_")[2]) for f in existing_files if f.endswith(".tif")]
-
-    new_dates = [d for d in available_dates if d not in dates_in_existing_files]
-
-    # Check S3 for existing dates
-    s3 = boto3.Session(profile_name=AWS_PROFILE).client("s3")
-    response = s3.list_objects_v2(Bucket=S3_INPUT_BUCKET, Prefix=BUCKET_PREFIX)
-    dates_in_s3 = [get_date_from_s3_key(item["Key"]) for item in response["Contents"]]
-    new_dates = [d for d in new_dates if d not in dates_in_s3]
+    with os.scandir(EXISTING_MERGED_FOLDER) as entries:
+        dates_in_existing_files = {
+            format_date(match.group(1))
+            for entry in entries
+            if entry.name.endswith(".tif")
+            and entry.is_file(follow_symlinks=False)
+            and (match := MERGED_TIF_DATE_PATTERN.search(entry.name))
+        }
+
+    new_dates = set(available_dates) - dates_in_existing_files
+
+    # Check S3 for existing dates, unless every available date is already merged locally
+    if new_dates:
+        s3 = get_s3_client()
+        # A single list_objects_v2 call stops at 1000 keys, so page through the whole prefix
+        paginator = s3.get_paginator("list_objects_v2")
+        new_dates -= {
+            get_date_from_s3_key(item["Key"])
+            for page in paginator.paginate(Bucket=S3_INPUT_BUCKET, Prefix=BUCKET_PREFIX)
+            for item in page.get("Contents", [])
+        }
 
     # Sort most recent dates first
-    new_dates.sort(key=lambda x: datetime.strptime(x, "%Y.%m.%d"), reverse=True)
+    new_dates = sorted(new_dates, key=lambda x: datetime.strptime(x, "%Y.%m.%d"), reverse=True)
 
     os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
     if len(new_dates) > 0:
         print(f"Downloading {len(new_dates)} new dates.")
         tiles = ["h08v05", "h09v05"]
         dates_to_process = new_dates[:limit] if limit else new_dates
-        pbar = tqdm.tqdm(
-            dates_to_process, desc="Downloading MODIS files", leave=False, total=len(dates_to_process) * len(tiles)
-        )
-        for date in pbar:
-            # files = get_files_for_date(date)
-            for tile in tqdm.tqdm(tiles, desc=f"Processing {date}", leave=False):
+        # Track the folder contents locally rather than listing the directory after every download
+        downloaded_files = set(os.listdir(DOWNLOAD_FOLDER))
+        # Downloads are I/O bound, so overlap them on a bounded pool of threads
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            futures = {
+                executor.submit(download_tile_from_s3, date, tile, dest_folder=DOWNLOAD_FOLDER): (date, tile)
+                for date in dates_to_process
+                for tile in tiles
+            }
+            pbar = tqdm.tqdm(as_completed(futures), desc="Downloading MODIS files", leave=False, total=len(futures))
+            for future in pbar:
+                date, tile = futures[future]
                 pbar.set_description(f"Processing {date}, {tile}")
-                downloaded_file = download_tile_from_s3(date, tile, dest_folder=DOWNLOAD_FOLDER)
+                downloaded_file = future.result()
 
                 if downloaded_file:
-                    pbar.set_postfix({"Downloaded": len(os.listdir(DOWNLOAD_FOLDER))})
+                    downloaded_files.add(os.path.basename(downloaded_file))
+                    pbar.set_postfix({"Downloaded": len(downloaded_files)})
+                    if on_download:
+                        on_download(downloaded_file)
                 else:
                     pbar.set_postfix({"Message": "No file found"})
-
-                pbar.update(1)
+        return dates_to_process
     else:
         print("No new dates to download.")
+        return []
 
 
 if __name__ == "__main__":
@@ -4,7 +4,10 @@ import boto3
 import json
 import requests
 import datetime
+import threading
+from botocore.config import Config
 from dotenv import load_dotenv
+from functools import lru_cache
 
 load_dotenv()
 
@@ -15,12 +18,28 @@ BASE_DATA_PRODUCT = os.getenv("MODIS_BASE_DATA_PRODUCT", "VJ116A2")
 DATA_PRODUCT_VERSION = os.getenv("MODIS_DATA_PRODUCT_VERSION", "002")
 DATA_PRODUCT = f"{BASE_DATA_PRODUCT}.{DATA_PRODUCT_VERSION}"
 
+# Adaptive retries back off exponentially on 5xx/SlowDown and rate limit the client's own requests once throttled,
+# instead of every download thread retrying at full speed
+S3_CLIENT_CONFIG = Config(
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    max_pool_connections=int(os.getenv("MODIS_DOWNLOAD_WORKERS", 16)),
+)
+
+# Guards the cached credentials file, which download threads would otherwise refresh and rewrite concurrently
+_credentials_lock = threading.Lock()
+
+# Shared HTTP session so the Earthdata login requests reuse pooled keep-alive connections
+_http = requests.Session()
+
 
 def retrieve_credentials():
-    """Authenticate with NASA Earthdata and retrieve temporary S3 credentials."""
+    """Retrieve temporary S3 credentials; parallel downloads share one cached refresh."""
+    with _credentials_lock:
+        return fetch_credentials()
 
-    login_resp = requests.get(S3_ENDPOINT, allow_redirects=False)
-    login_resp.raise_for_status()
+
+def fetch_credentials():
+    """Authenticate with NASA Earthdata and retrieve temporary S3 credentials."""
 
     temp_cred_path = ".temp_s3_credentials.json"
     if os.path.exists(temp_cred_path):
@@ -42,10 +61,14 @@ def retrieve_credentials():
     if not EDL_USERNAME or not EDL_PASSWORD:
         raise ValueError("EDL_USERNAME and EDL_PASSWORD must be set")
 
+    # Only start the login flow once the cached credentials are known to be unusable
+    login_resp = _http.get(S3_ENDPOINT, allow_redirects=False)
+    login_resp.raise_for_status()
+
     auth = f"{EDL_USERNAME}:{EDL_PASSWORD}"
     encoded_auth = base64.b64encode(auth.encode("ascii")).decode("ascii")
 
-    auth_redirect = requests.post(
+    auth_redirect = _http.post(
         login_resp.headers["location"],
         data={"credentials": encoded_auth},
         headers={"Origin": S3_ENDPOINT},
@@ -53,8 +76,8 @@ def retrieve_credentials():
     )
     auth_redirect.raise_for_status()
 
-    final = requests.get(auth_redirect.headers["location"], allow_redirects=False)
-    results = requests.get(S3_ENDPOINT, cookies={"accessToken": final.cookies["accessToken"]})
+    final = _http.get(auth_redirect.headers["location"], allow_redirects=False)
+    results = _http.get(S3_ENDPOINT, cookies={"accessToken": final.cookies["accessToken"]})
     results.raise_for_status()
     creds = json.loads(results.content)
 
@@ -64,6 +87,24 @@ def retrieve_credentials():
     return json.loads(results.content)
 
 
+@lru_cache(maxsize=1)
+def create_s3_client(access_key_id, secret_access_key, session_token):
+    """Create the S3 client for one set of temporary credentials."""
+    return boto3.client(
+        "s3",
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        aws_session_token=session_token,
+        config=S3_CLIENT_CONFIG,
+    )
+
+
+def get_s3_client():
+    """Get the S3 client for the current credentials, shared by all threads so they share its rate limiter."""
+    creds = retrieve_credentials()
+    return create_s3_client(creds["accessKeyId"], creds["secretAccessKey"], creds["sessionToken"])
+
+
 def download_tile_from_s3(date, tile, dest_folder="modis_downloads"):
     """Download a file from NASA's S3 bucket using temporary credentials."""
     os.makedirs(dest_folder, exist_ok=True)
@@ -75,14 +116,7 @@ def download_tile_from_s3(date, tile, dest_folder="modis_downloads"):
     if os.path.exists(os.path.join(dest_folder, output_name)):
         return save_path
 
-    creds = retrieve_credentials()
-
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=creds["accessKeyId"],
-        aws_secret_access_key=creds["secretAccessKey"],
-        aws_session_token=creds["sessionToken"],
-    )
+    s3 = get_s3_client()
 
     object_path = f"{DATA_PRODUCT}/{filename}"
     response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=object_path)
@@ -103,14 +137,7 @@ def list_all_tiles_for_year(year):
     """List all available MODIS tiles for a given year."""
     year_str = str(year)
     filename = f"{BASE_DATA_PRODUCT}.A{year_str}"
-    creds = retrieve_credentials()
-
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=creds["accessKeyId"],
-        aws_secret_access_key=creds["secretAccessKey"],
-        aws_session_token=creds["sessionToken"],
-    )
+    s3 = get_s3_client()
 
     object_path = f"{DATA_PRODUCT}/{filename}"
     response = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix=object_path)
@@ -131,13 +158,7 @@ def list_all_dates_for_year(year):
     """List all available MODIS dates for a given year."""
     year_str = str(year)
     filename = f"{BASE_DATA_PRODUCT}.A{year_str}"
-    creds = retrieve_credentials()
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=creds["accessKeyId"],
-        aws_secret_access_key=creds["secretAccessKey"],
-        aws_session_token=creds["sessionToken"],
-    )
+    s3 = get_s3_client()
     object_path = f"{DATA_PRODUCT}/{filename}"
     dates = set()
     paginator = s3.get_paginator("list_objects_v2")
@@ -1,5 +1,7 @@
 import os
 import subprocess
+from osgeo import gdal
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
 
@@ -15,128 +17,194 @@ OUTPUT_DIR = get_env_path("MODIS_OUTPUT_DIR", "~/data/modis_net_et_8_day/et_tile
 MERGED_DIR = get_env_path("MODIS_MERGED_DIR", "~/data/modis_net_et_8_day/raw_et")
 TEMP_DIR = get_env_path("MODIS_TEMP_DIR", "~/data/modis_net_et_8_day/temp")
 DATA_PRODUCT = os.getenv("MODIS_BASE_DATA_PRODUCT", "MOD16A2GF")
+MERGE_WORKERS = int(os.getenv("MODIS_MERGE_WORKERS", os.cpu_count() or 1))
+# gdal2tiles processes per date; split the cores between the date workers so the two pools don't oversubscribe
+TILE_PROCESSES = int(os.getenv("MODIS_TILE_PROCESSES", max(1, (os.cpu_count() or 1) // MERGE_WORKERS)))
 
+# ZSTD level 1 encodes much faster than LZW and compresses better with the floating point predictor. The extracted
+# bands are integer, but the warp writes the merged output as Float32 (outputType in process_date), so PREDICTOR=3
+# rather than the integer-only horizontal predictor. 256px blocks line up with the tile server's 256px reads.
+MERGED_TIF_CREATION_OPTIONS = [
+    "COMPRESS=ZSTD",
+    "ZSTD_LEVEL=1",
+    "PREDICTOR=3",
+    "TILED=YES",
+    "BLOCKXSIZE=256",
+    "BLOCKYSIZE=256",
+]
 
-def merge_and_process_tiffs(generate_tiles=False, min_zoom=1, max_zoom=11, band_name="ET_500m", output_band_name="ET"):
+# Raise RuntimeError on GDAL failures instead of returning None
+gdal.UseExceptions()
+
+
+def build_overviews(tif_path, levels=(2, 4, 8, 16, 32, 64)):
+    """Build internal AVERAGE overviews so low zoom reads decode a downsampled level instead of the full raster."""
+    dataset = gdal.Open(tif_path, gdal.GA_Update)
+    dataset.BuildOverviews("AVERAGE", list(levels))
+    dataset = None
+
+
+def write_band_statistics(tif_path):
+    """Compute exact band statistics and persist them as STATISTICS_* tags in the GeoTIFF.
+
+    The tile server reads these tags instead of scanning the full raster on every stats request.
+    """
+    dataset = gdal.Open(tif_path, gdal.GA_Update)
+    # Opened in update mode, the GTiff driver stores the statistics in the file's internal metadata
+    dataset.GetRasterBand(1).ComputeStatistics(False)
+    dataset.FlushCache()
+    dataset = None
+
+
+def get_merged_tif_path(date, output_band_name):
+    """Path of the merged Web Mercator TIFF for a date and band."""
+    return os.path.join(MERGED_DIR, f"{DATA_PRODUCT}_MERGED_{date}_{output_band_name}.tif")
+
+
+def merge_and_process_tiffs(
+    generate_tiles=False, min_zoom=1, max_zoom=11, band_name="ET_500m", output_band_name="ET", on_merged=None
+):
     """Merge TIFFs, reproject to Web Mercator, and optionally generate tiles.
 
     Args:
         generate_tiles: Whether to generate PNG tiles (requires colorized TIFF)
+        on_merged: Optional callback given the merged TIFF path as soon as each date finishes
+    """
+    merge_and_process_bands({band_name: output_band_name}, generate_tiles, min_zoom, max_zoom, on_merged)
+
+
+def merge_and_process_bands(bands, generate_tiles=False, min_zoom=1, max_zoom=11, on_merged=None):
+    """Merge TIFFs, reproject to Web Mercator, and optionally generate tiles for several bands at once.
+
+    Each date folder is independent, so the dates are processed in parallel worker processes. A worker handles every
+    band of its date, so one band's tile generation overlaps the other dates' merges instead of each band waiting
+    for the slowest date of the previous one.
+
+    Args:
+        bands: Mapping of the HDF band names to the output band names
+        generate_tiles: Whether to generate PNG tiles (requires colorized TIFF)
+        on_merged: Optional callback given the merged TIFF path as soon as each date finishes
     """
     os.makedirs(TEMP_DIR, exist_ok=True)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     os.makedirs(MERGED_DIR, exist_ok=True)
 
-    pb = tqdm(os.listdir(INPUT_DIR), desc="Processing date folders")
-    for date_folder in pb:
-        date_folder_path = os.path.join(INPUT_DIR, date_folder)
-        if not os.path.isdir(date_folder_path):
-            continue
-
-        date = date_folder
-        tile_output = os.path.join(OUTPUT_DIR, date, "tiles")
-        merged_tif = os.path.join(TEMP_DIR, f"{DATA_PRODUCT}_{band_name}_{date}_merged.tif")
-        merc_tif = os.path.join(MERGED_DIR, f"{DATA_PRODUCT}_MERGED_{date}_{output_band_name}.tif")
-        color_tif = os.path.join(TEMP_DIR, f"{DATA_PRODUCT}_{band_name}_{date}_color.tif")
-
-        # Skip if already processed
-        if os.path.exists(merc_tif) and (not generate_tiles or os.path.exists(color_tif)):
-            pb.set_description(f"Skipping {date} - already processed")
-            continue
-
-        # Merge TIFFs - only include files for the current band
-        tiff_files = [
-            os.path.join(date_folder_path, f)
-            for f in os.listdir(date_folder_path)
-            if f.endswith(".tif") and f"_{band_name}" in f
-        ]
-        if not tiff_files:
-            pb.set_description(f"No TIFF files found for {date} and band {band_name}")
-            continue
-
-        print(f"Merging {len(tiff_files)} TIFFs for {date} and band {band_name}...")
-        merge_cmd = [
-            "gdal_merge.py",
-            "-o",
-            merged_tif,
-            "-of",
-            "GTiff",
-            "-n",
-            "32700",
-            "-a_nodata",
-            "32700",
-            "-co",
-            "COMPRESS=LZW",
-            "-co",
-            "BIGTIFF=YES",
-        ] + tiff_files
-
+    dates = [d for d in os.listdir(INPUT_DIR) if os.path.isdir(os.path.join(INPUT_DIR, d))]
+    with ProcessPoolExecutor(max_workers=MERGE_WORKERS) as executor:
+        futures = {
+            executor.submit(process_date_bands, date, generate_tiles, min_zoom, max_zoom, bands): date
+            for date in dates
+        }
+        pb = tqdm(as_completed(futures), desc="Processing date folders", total=len(futures))
+        for future in pb:
+            for message in future.result():
+                if message:
+                    pb.set_description(message)
+
+            for output_band_name in bands.values():
+                merc_tif = get_merged_tif_path(futures[future], output_band_name)
+                if on_merged and os.path.exists(merc_tif):
+                    on_merged(merc_tif)
+
+
+def process_date_bands(date, generate_tiles, min_zoom, max_zoom, bands):
+    """Process each band of one date folder in order, since the bands share the date's tile output folder."""
+    return [
+        process_date(date, generate_tiles, min_zoom, max_zoom, band_name, output_band_name)
+        for band_name, output_band_name in bands.items()
+    ]
+
+
+def process_date(date, generate_tiles, min_zoom, max_zoom, band_name, output_band_name):
+    """Merge, reproject and optionally tile one date folder, returning a status message when it is skipped."""
+    date_folder_path = os.path.join(INPUT_DIR, date)
+    tile_output = os.path.join(OUTPUT_DIR, date, "tiles")
+    merc_tif = get_merged_tif_path(date, output_band_name)
+    color_tif = os.path.join(TEMP_DIR, f"{DATA_PRODUCT}_{band_name}_{date}_color.tif")
+
+    # Skip if already processed
+    if os.path.exists(merc_tif) and (not generate_tiles or os.path.exists(color_tif)):
+        return f"Skipping {date} - already processed"
+
+    # Merge TIFFs - only include files for the current band
+    tiff_files = [
+        os.path.join(date_folder_path, f)
+        for f in os.listdir(date_folder_path)
+        if f.endswith(".tif") and f"_{band_name}" in f
+    ]
+    if not tiff_files:
+        return f"No TIFF files found for {date} and band {band_name}"
+
+    print(f"Merging {len(tiff_files)} TIFFs for {date} and band {band_name}...")
+    try:
+        # Mosaic through an in-memory VRT that the warp reads the source tiles through directly, so no merged
+        # GeoTIFF is written; nodata source pixels are skipped just like gdal_merge.py -n
+        merged_vrt = gdal.BuildVRT("", tiff_files, srcNodata=32700, VRTNodata=32700)
+    except RuntimeError as e:
+        print(f"Error merging TIFFs for {date}: {e}")
+        return None
+
+    # Reproject to Web Mercator
+    print(f"Reprojecting to Web Mercator for {date}...")
+    try:
+        gdal.Warp(
+            merc_tif,
+            merged_vrt,
+            # gdal.Warp writes into an existing destination unless told to overwrite it
+            options=["-overwrite"],
+            dstSRS="EPSG:3857",
+            xRes=500,
+            yRes=500,
+            targetAlignedPixels=True,
+            resampleAlg="bilinear",
+            dstNodata=32700,
+            # The extracted tiles are integer, but the merged output stays Float32 so bilinear values aren't rounded
+            outputType=gdal.GDT_Float32,
+            creationOptions=MERGED_TIF_CREATION_OPTIONS,
+        )
+    except RuntimeError as e:
+        print(f"Error reprojecting {date}: {e}")
+        return None
+
+    try:
+        build_overviews(merc_tif)
+        write_band_statistics(merc_tif)
+    except RuntimeError as e:
+        print(f"Error building overviews or statistics for {date}: {e}")
+
+    # Only apply color relief if we're generating tiles
+    if generate_tiles:
+        print(f"Applying color ramp for {date}...")
         try:
-            subprocess.run(merge_cmd, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error merging TIFFs for {date}: {e}")
-            continue
-
-        # Reproject to Web Mercator
-        print(f"Reprojecting to Web Mercator for {date}...")
-        warp_cmd = [
-            "gdalwarp",
-            "-t_srs",
+            gdal.DEMProcessing(color_tif, merc_tif, "color-relief", colorFilename="colormap.txt", addAlpha=True)
+            # gdal2tiles reads this raster, not merc_tif, so give it its own overviews for the low zoom levels
+            build_overviews(color_tif)
+        except RuntimeError as e:
+            print(f"Error applying color relief for {date}: {e}")
+            return None
+
+        # Generate tiles
+        print(f"Generating tiles for {date}...")
+        os.makedirs(tile_output, exist_ok=True)
+        tile_cmd = [
+            "gdal2tiles.py",
+            f"--zoom={min_zoom}-{max_zoom}",
+            "--tilesize=256",
+            f"--processes={TILE_PROCESSES}",
+            "-s",
             "EPSG:3857",
-            "-tr",
-            "500",
-            "500",
-            "-tap",
-            "-r",
-            "bilinear",
-            "-dstnodata",
-            "32700",
-            "-co",
-            "COMPRESS=LZW",
-            "-overwrite",
-            merged_tif,
-            merc_tif,
+            "-w",
+            "leaflet",
+            color_tif,
+            tile_output,
         ]
 
         try:
-            subprocess.run(warp_cmd, check=True)
+            subprocess.run(tile_cmd, check=True)
         except subprocess.CalledProcessError as e:
-            print(f"Error reprojecting {date}: {e}")
-            continue
-
-        # Only apply color relief if we're generating tiles
-        if generate_tiles:
-            print(f"Applying color ramp for {date}...")
-            color_cmd = ["gdaldem", "color-relief", merc_tif, "colormap.txt", color_tif, "-alpha"]
-
-            try:
-                subprocess.run(color_cmd, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error applying color relief for {date}: {e}")
-                continue
-
-            # Generate tiles
-            print(f"Generating tiles for {date}...")
-            os.makedirs(tile_output, exist_ok=True)
-            tile_cmd = [
-                "gdal2tiles.py",
-                f"--zoom={min_zoom}-{max_zoom}",
-                "--tilesize=256",
-                "-s",
-                "EPSG:3857",
-                "-w",
-                "leaflet",
-                color_tif,
-                tile_output,
-            ]
-
-            try:
-                subprocess.run(tile_cmd, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error generating tiles for {date}: {e}")
-                continue
-
-        # Clean up intermediate files
-        os.remove(merged_tif)
-        if generate_tiles:
-            os.remove(color_tif)
+            print(f"Error generating tiles for {date}: {e}")
+            return None
+
+    # Clean up intermediate files
+    if generate_tiles:
+        os.remove(color_tif)
@@ -1,11 +1,15 @@
 import os
 import argparse
+import hashlib
 import time
 import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from os.path import join, dirname
 from dotenv import load_dotenv
-import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
 from tqdm import tqdm
 from pathlib import Path
 import json
@@ -47,6 +51,12 @@ S3_BUCKET = os.getenv("MODIS_S3_BUCKET", "lp-prod-protected")
 S3_INPUT_BUCKET = os.getenv("S3_INPUT_BUCKET", "ose-dev-inputs")
 AWS_PROFILE = os.getenv("AWS_PROFILE", None)
 BUCKET_PREFIX = os.getenv("BUCKET_PREFIX", "modis/")
+UPLOAD_CONCURRENCY = int(os.getenv("MODIS_UPLOAD_WORKERS", 16))
+# Part size and threshold of multipart uploads. 16MB parts halve the part requests per merged TIFF compared with the
+# 8MB default.
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+# Bound on the items waiting between two pipeline stages, so a fast stage can't run far ahead of a slow one
+PIPELINE_QUEUE_SIZE = 4
 
 # Set environment variables for other scripts
 os.environ["MODIS_DOWNLOAD_DIR"] = DOWNLOAD_FOLDER
@@ -64,13 +74,14 @@ BAND_MAPPING = {
     "PET_500m": "PET",
 }
 
-from fetch_modis import fetch_new_dates
-from workflow import process_hdf_files
-from merge_process import merge_and_process_tiffs
+from fetch_modis import fetch_new_dates, get_s3_client
+from workflow import process_hdf_file, process_hdf_files
+from merge_process import merge_and_process_bands
 
 
+@lru_cache(maxsize=1)
 def get_client_version():
-    """Get the client version from package.json."""
+    """Get the client version from package.json, read once per process since it can't change while monitoring."""
     try:
         with open("./package.json", "r") as f:
             package_data = json.load(f)
@@ -80,34 +91,113 @@ def get_client_version():
         return None
 
 
-def upload_to_s3():
+def list_existing_objects(s3):
+    """Map the keys already in the S3 input bucket under the MODIS prefix to their (ETag, size, LastModified).
+
+    Each LIST page covers 1000 keys, so even a prefix with years of dates and bands takes a handful of requests,
+    fewer round trips than HEAD requests for the files being uploaded, however concurrent.
     """
-    Sync the processed TIFF files to the S3 input bucket.
+    existing_objects = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=S3_INPUT_BUCKET, Prefix=BUCKET_PREFIX):
+        existing_objects.update(
+            (obj["Key"], (obj["ETag"].strip('"'), obj["Size"], obj["LastModified"])) for obj in page.get("Contents", [])
+        )
+    return existing_objects
+
+
+@lru_cache(maxsize=1024)
+def get_file_md5(path, mtime_ns, size):
+    """Hash a file once per (path, mtime, size); the mtime and size are only part of the cache key."""
+    file_md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(MULTIPART_CHUNKSIZE), b""):
+            file_md5.update(chunk)
+    return file_md5.hexdigest()
+
+
+def matches_s3_object(path, etag, size, last_modified):
+    """Check whether a local file has the same content as an S3 object, hashing only files changed since the upload."""
+    stat = os.stat(path)
+    if stat.st_size != size:
+        return False
+
+    # Uploaded after the file was last written, so it holds this file; this covers every unchanged file in the sweep
+    if last_modified.timestamp() >= stat.st_mtime:
+        return True
+
+    # Only plain single-part uploads have the MD5 as their ETag, so anything else is decided by size and LastModified
+    # alone; an SSE-KMS ETag looks like an MD5 but never matches, which at worst uploads the file again
+    if "-" in etag or len(etag) != 32:
+        return False
+    return get_file_md5(path, stat.st_mtime_ns, stat.st_size) == etag
+
+
+def upload_to_s3(merged_files=None):
     """
-    session = boto3.Session(profile_name=AWS_PROFILE)
-    s3 = session.client("s3")
-
-    # Get all files in the output directory
-    files = [file for file in os.listdir(MERGED_DIR) if file.endswith(".tif")]
-    pbar = tqdm(files, desc="Uploading to S3", total=len(files), leave=False)
-    for file in pbar:
-        # Only upload files that are not already in the S3 bucket
-        key = f"{BUCKET_PREFIX}{file}"
-
-        try:
-            exists = s3.head_object(Bucket=S3_INPUT_BUCKET, Key=key)
-        except Exception as e:
-            exists = False
+    Sync the processed TIFF files to the S3 input bucket.
 
-        if not exists:
+    If a queue is given, the TIFF paths put on it are uploaded as they arrive until a None sentinel is received,
+    then the rest of the merged directory is synced.
+    """
+    s3 = get_s3_client()
+
+    # List the bucket once instead of sending a HEAD request per file
+    existing_objects = list_existing_objects(s3)
+    pbar = tqdm(desc="Uploading to S3", leave=False)
+
+    # One transfer manager queues every upload, so whole files and their multipart parts share one thread pool
+    transfer_config = TransferConfig(
+        max_concurrency=UPLOAD_CONCURRENCY,
+        multipart_threshold=MULTIPART_CHUNKSIZE,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        use_threads=True,
+    )
+    with create_transfer_manager(s3, transfer_config) as manager:
+        uploads = {}
+
+        def queue_upload(file):
+            # Only upload files that are not already queued or identical to the object in the S3 bucket
+            key = f"{BUCKET_PREFIX}{file}"
+            path = os.path.join(MERGED_DIR, file)
+
+            if key in uploads:
+                return
+            if key not in existing_objects or not matches_s3_object(path, *existing_objects[key]):
+                uploads[key] = (file, manager.upload(path, S3_INPUT_BUCKET, key))
+            else:
+                pbar.set_postfix(file=file, exists="True (skipping)")
+                pbar.update(1)
+
+        if merged_files is not None:
+            for path in iter(merged_files.get, None):
+                queue_upload(os.path.basename(path))
+
+        # Get the files in the output directory that the stream didn't already queue
+        with os.scandir(MERGED_DIR) as entries:
+            local_files = {entry.name for entry in entries if entry.name.endswith(".tif") and entry.is_file()}
+        for file in sorted(local_files - {file for file, _ in uploads.values()}):
+            queue_upload(file)
+
+        pbar.total = pbar.n + len(uploads)
+        for key, (file, future) in uploads.items():
             pbar.set_postfix(file=file)
             try:
-                s3.upload_file(os.path.join(MERGED_DIR, file), S3_INPUT_BUCKET, key)
+                future.result()
                 logging.info(f"Uploaded {file} to s3://{S3_INPUT_BUCKET}/{key}")
             except Exception as e:
                 logging.error(f"Error uploading {file} to S3: {e}")
-        else:
-            pbar.set_postfix(file=file, exists="True (skipping)")
+            pbar.update(1)
+
+
+def drain_queue(items, handler):
+    """Call handler on each item put on the queue until a None sentinel is received."""
+    for item in iter(items.get, None):
+        # Keep draining after a failure so the producer never blocks on a full queue
+        try:
+            handler(item)
+        except Exception as e:
+            logging.error(f"Error processing {item}: {e}")
 
 
 def start_workflow(
@@ -136,7 +226,9 @@ def start_workflow(
     # Remove duplicates from bands and set default bands if none provided
     bands = list(set(bands)) if bands else ["ET_500m", "PET_500m"]
 
+    first_cycle = True
     while True:
+        cycle_start = time.monotonic()
         logging.info(f"Starting MODIS processing workflow ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})...")
         if AWS_PROFILE:
             logging.info(f"AWS profile: {AWS_PROFILE}")
@@ -155,33 +247,57 @@ def start_workflow(
         logging.info(f"S3 bucket: {S3_BUCKET}")
         logging.info(f"Generate tiles: {generate_tiles}\n")
 
-        logging.info("\nChecking for new MODIS data...")
-        fetch_new_dates(limit=limit)
-
-        logging.info("\nProcessing HDF files...")
-        process_hdf_files(bands=bands)
-
-        logging.info("\nMerging and processing TIFFs...")
-        for band_name in bands:
-            output_band_name = BAND_MAPPING.get(band_name, "")
-            merge_and_process_tiffs(
-                generate_tiles=generate_tiles,
-                min_zoom=min_zoom,
-                max_zoom=max_zoom,
-                band_name=band_name,
-                output_band_name=output_band_name,
-            )
-
-        if S3_INPUT_BUCKET:
-            logging.info("\nUploading to S3...")
-            upload_to_s3()
+        # Each stage hands its output to the next one through a bounded queue, so HDF extraction overlaps the
+        # downloads and the S3 upload overlaps the merges
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            logging.info("\nChecking for new MODIS data and processing HDF files...")
+            downloaded_files = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            processor = executor.submit(drain_queue, downloaded_files, lambda path: process_hdf_file(path, bands))
+            try:
+                new_dates = fetch_new_dates(limit=limit, on_download=downloaded_files.put)
+            finally:
+                downloaded_files.put(None)
+            processor.result()
+
+            # A monitor cycle that downloaded nothing has nothing new to extract, merge or upload, so skip the
+            # sweeps; the first cycle still runs them to pick up work left over from earlier runs
+            if not new_dates and not first_cycle:
+                logging.info("\nNo new MODIS data, skipping processing.")
+            else:
+                # Pick up any HDF files left over from earlier runs
+                process_hdf_files(bands=bands)
+
+                logging.info("\nMerging and processing TIFFs...")
+                merged_files = None
+                if S3_INPUT_BUCKET:
+                    logging.info("Uploading to S3 as dates finish merging...")
+                    # Unbounded, since the uploader can fail before it starts draining and the paths are tiny
+                    merged_files = queue.Queue()
+                    uploader = executor.submit(upload_to_s3, merged_files)
+
+                try:
+                    merge_and_process_bands(
+                        {band_name: BAND_MAPPING.get(band_name, "") for band_name in bands},
+                        generate_tiles=generate_tiles,
+                        min_zoom=min_zoom,
+                        max_zoom=max_zoom,
+                        on_merged=merged_files.put if merged_files is not None else None,
+                    )
+                finally:
+                    if merged_files is not None:
+                        merged_files.put(None)
+
+                if merged_files is not None:
+                    uploader.result()
 
         logging.info("\nMODIS processing workflow completed!")
 
         if not monitor or limit is not None:
             break
 
-        time.sleep(interval)
+        first_cycle = False
+        # Keep a fixed cadence rather than drifting by the length of each cycle
+        time.sleep(max(0, interval - (time.monotonic() - cycle_start)))
 
 
 def main():
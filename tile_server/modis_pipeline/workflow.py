@@ -2,9 +2,11 @@ import os
 from pyhdf.SD import SD, SDC
 import h5py
 import numpy as np
-from osgeo import gdal, osr
+from osgeo import gdal, gdal_array, osr
 import re
 import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from tqdm import tqdm
 
 
@@ -18,6 +20,31 @@ def get_env_path(key, default):
 DOWNLOAD_FOLDER = get_env_path("MODIS_DOWNLOAD_DIR", "~/data/modis_net_et_8_day/downloads")
 INPUT_DIR = get_env_path("MODIS_INPUT_DIR", "~/data/modis_net_et_8_day/et_tiffs")
 BASE_DATA_PRODUCT = os.getenv("MODIS_BASE_DATA_PRODUCT", "VJ116A2")
+EXTRACT_WORKERS = int(os.getenv("MODIS_EXTRACT_WORKERS", os.cpu_count() or 1))
+
+# Acquisition date and tile ID in a downloaded file name, compiled once for every file of every run
+HDF_FILENAME_PATTERN = re.compile(
+    rf"{BASE_DATA_PRODUCT}(?:GF)?\.A(\d{{7}})\.(h\d{{2}}v\d{{2}})"
+    if BASE_DATA_PRODUCT == "MOD16A2" or BASE_DATA_PRODUCT == "VJ116A2"
+    else rf"{BASE_DATA_PRODUCT}\.A(\d{{7}})\.(h\d{{2}}v\d{{2}})"
+)
+
+# Tiled and compressed so the merge reads whole blocks instead of scanlines, and the per-tile files are a fraction of
+# their raw size. No overviews: the warp reads these once at close to native resolution.
+EXTRACTED_TIF_CREATION_OPTIONS = [
+    "TILED=YES",
+    "BLOCKXSIZE=512",
+    "BLOCKYSIZE=512",
+    "COMPRESS=ZSTD",
+    "ZSTD_LEVEL=1",
+    "SPARSE_OK=TRUE",
+]
+
+# Rows read, masked and written at a time, one block row of the output, so the full band is never held in memory
+STRIPE_ROWS = 512
+
+# Fill values are written as the nodata value the merge and the tile server already treat as missing
+NODATA_VALUE = 32700
 
 
 def convert_date(yyyyddd):
@@ -28,6 +55,43 @@ def convert_date(yyyyddd):
     return date.strftime("%Y%m%d")
 
 
+@lru_cache(maxsize=1)
+def get_sinusoidal_wkt():
+    """WKT of the MODIS sinusoidal projection, exported once per process since it is the same for every tile."""
+    srs = osr.SpatialReference()
+    srs.ImportFromProj4("+proj=sinu +R=6371007.181 +nadgrids=@null +wktext")
+    return srs.ExportToWkt()
+
+
+def create_band_tif(output_tif, shape, dtype):
+    """Create the output GeoTIFF for a band in its native data type, with NODATA_VALUE as nodata."""
+    # Horizontal differencing for integer bands, the floating point predictor otherwise
+    predictor = 3 if np.issubdtype(dtype, np.floating) else 2
+    options = EXTRACTED_TIF_CREATION_OPTIONS + [f"PREDICTOR={predictor}"]
+
+    driver = gdal.GetDriverByName("GTiff")
+    rows, cols = shape
+    dst_ds = driver.Create(output_tif, cols, rows, 1, gdal_array.NumericTypeCodeToGDALTypeCode(dtype), options)
+    dst_ds.GetRasterBand(1).SetNoDataValue(NODATA_VALUE)
+    return dst_ds
+
+
+def write_band_stripes(dst_ds, band_data):
+    """Copy a 2D HDF dataset into the output band in row stripes, flagging the fill values as nodata.
+
+    Stripes that are entirely fill (ocean, or outside the product's land mask) are not written at all; with
+    SPARSE_OK their blocks stay unallocated in the file and read back as nodata.
+    """
+    band = dst_ds.GetRasterBand(1)
+    for y in range(0, dst_ds.RasterYSize, STRIPE_ROWS):
+        data = band_data[y : y + STRIPE_ROWS, :]
+        fill = (data == -32767) | (data > 32700)
+        if fill.all():
+            continue
+        data[fill] = NODATA_VALUE
+        band.WriteArray(data, 0, y)
+
+
 def extract_band_from_hdf4(hdf_file, band_name="ET_500m", output_tif=None):
     """
     Extract band data from HDF4 files using pyhdf.
@@ -39,10 +103,7 @@ def extract_band_from_hdf4(hdf_file, band_name="ET_500m", output_tif=None):
     """
     hdf = SD(hdf_file, SDC.READ)
 
-    data = hdf.select(band_name)[:]
-
-    data = np.where(data == -32767, np.nan, data)
-    data = np.where(data > 32700, np.nan, data)
+    band_data = hdf.select(band_name)
 
     # Get geo info
     metadata = hdf.attributes()
@@ -59,17 +120,15 @@ def extract_band_from_hdf4(hdf_file, band_name="ET_500m", output_tif=None):
     # Size of the pixel
     geotransform = (ulx, 463.312716527917246, 0, uly, 0, -463.312716527917246)
 
-    driver = gdal.GetDriverByName("GTiff")
-    rows, cols = data.shape
-    dst_ds = driver.Create(output_tif, cols, rows, 1, gdal.GDT_Float32)
+    # pyhdf only exposes the HDF type code, so take the numpy type from a one pixel read
+    dst_ds = create_band_tif(output_tif, band_data.info()[2], band_data[0:1, 0:1].dtype)
 
     dst_ds.SetGeoTransform(geotransform)
 
-    srs = osr.SpatialReference()
-    srs.ImportFromProj4("+proj=sinu +R=6371007.181 +nadgrids=@null +wktext")
-    dst_ds.SetProjection(srs.ExportToWkt())
+    dst_ds.SetProjection(get_sinusoidal_wkt())
 
-    dst_ds.GetRasterBand(1).WriteArray(data)
+    # Keep the native integer data instead of a float copy with NaNs, reading it one stripe at a time
+    write_band_stripes(dst_ds, band_data)
     dst_ds.FlushCache()
     dst_ds = None
     hdf.end()
@@ -91,17 +150,13 @@ def extract_band_from_h5(h5_file, band_name="ET_500m", output_tif=None):
         def find_dataset(name, obj):
             if isinstance(obj, h5py.Dataset) and band_name in name:
                 nonlocal band_data
-                band_data = obj[:]
+                band_data = obj
 
         h5f.visititems(find_dataset)
 
         if band_data is None:
             raise ValueError(f"Band {band_name} not found in {h5_file}")
 
-        # Apply data filters
-        data = np.where(band_data == -32767, np.nan, band_data)
-        data = np.where(data > 32700, np.nan, data)
-
         # Try to extract geospatial information from metadata
         # H5 files might store metadata differently, so we'll look for common attributes
         geotransform = None
@@ -127,17 +182,13 @@ def extract_band_from_h5(h5_file, band_name="ET_500m", output_tif=None):
             geotransform = (0, 1, 0, 0, 0, -1)  # Default identity transform
 
         # Create output TIFF
-        driver = gdal.GetDriverByName("GTiff")
-        rows, cols = data.shape
-        dst_ds = driver.Create(output_tif, cols, rows, 1, gdal.GDT_Float32)
+        dst_ds = create_band_tif(output_tif, band_data.shape, band_data.dtype)
 
         dst_ds.SetGeoTransform(geotransform)
 
-        srs = osr.SpatialReference()
-        srs.ImportFromProj4("+proj=sinu +R=6371007.181 +nadgrids=@null +wktext")
-        dst_ds.SetProjection(srs.ExportToWkt())
+        dst_ds.SetProjection(get_sinusoidal_wkt())
 
-        dst_ds.GetRasterBand(1).WriteArray(data)
+        write_band_stripes(dst_ds, band_data)
         dst_ds.FlushCache()
         dst_ds = None
 
@@ -153,6 +204,8 @@ def extract_band_name(hdf_file, band_name="ET_500m", output_tif=None):
     """
     file_ext = os.path.splitext(hdf_file)[1].lower()
 
+    # The granules are read from local disk rather than through /vsis3/: pyhdf and the HDF4/HDF5 libraries behind
+    # GDAL's drivers need a real file path. h5py only reads the matching band's chunks, so the read is already partial.
     if file_ext == ".hdf":
         extract_band_from_hdf4(hdf_file, band_name, output_tif)
     elif file_ext == ".h5":
@@ -161,35 +214,60 @@ def extract_band_name(hdf_file, band_name="ET_500m", output_tif=None):
         raise ValueError(f"Unsupported file format: {file_ext}")
 
 
+def get_extraction_tasks(file_path, bands=["ET_500m"]):
+    """List the (file, band, output TIFF) extractions of one downloaded HDF file that haven't been done yet.
+
+    Args:
+        file_path: Path to the HDF4 (.hdf) or HDF5 (.h5) file
+        bands: List of band names to extract (default: ["ET_500m"])
+    """
+    filename = os.path.basename(file_path)
+    match = HDF_FILENAME_PATTERN.search(filename)
+    if not match:
+        print(f"Skipping {filename}")
+        return []
+
+    yyyyddd, tile_id = match.groups()
+    date_str = convert_date(yyyyddd)
+
+    output_dir = os.path.join(INPUT_DIR, date_str)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tasks = []
+    for band_name in bands:
+        output_tif = os.path.join(output_dir, f"{BASE_DATA_PRODUCT}_{band_name}_{date_str}_{tile_id}.tif")
+
+        if not os.path.exists(output_tif):
+            tasks.append((file_path, band_name, output_tif))
+    return tasks
+
+
+def process_hdf_file(file_path, bands=["ET_500m"]):
+    """Extract the requested bands of one downloaded HDF file into per-date TIFFs.
+
+    Args:
+        file_path: Path to the HDF4 (.hdf) or HDF5 (.h5) file
+        bands: List of band names to extract (default: ["ET_500m"])
+    """
+    for task in get_extraction_tasks(file_path, bands):
+        extract_band_name(*task)
+
+
 def process_hdf_files(bands=["ET_500m"]):
     """Process downloaded HDF files into TIFFs.
 
+    Every tile and band is an independent extraction, so they run in parallel worker processes.
+
     Args:
         bands: List of band names to extract (default: ["ET_500m"])
     """
-    et_tile_folder = INPUT_DIR
-    pattern = (
-        rf"{BASE_DATA_PRODUCT}(?:GF)?\.A(\d{{7}})\.(h\d{{2}}v\d{{2}})"
-        if BASE_DATA_PRODUCT == "MOD16A2" or BASE_DATA_PRODUCT == "VJ116A2"
-        else rf"{BASE_DATA_PRODUCT}\.A(\d{{7}})\.(h\d{{2}}v\d{{2}})"
-    )
-
-    for filename in tqdm(os.listdir(DOWNLOAD_FOLDER), desc="Processing HDF files"):
-        if filename.endswith((".hdf", ".h5")):
-            match = re.search(pattern, filename)
-            if not match:
-                print(f"Skipping {filename}")
-                continue
-
-            yyyyddd, tile_id = match.groups()
-            date_str = convert_date(yyyyddd)
-
-            output_dir = os.path.join(et_tile_folder, date_str)
-            os.makedirs(output_dir, exist_ok=True)
-
-            for band_name in bands:
-                output_tif = os.path.join(output_dir, f"{BASE_DATA_PRODUCT}_{band_name}_{date_str}_{tile_id}.tif")
-                file_path = os.path.join(DOWNLOAD_FOLDER, filename)
-
-                if not os.path.exists(output_tif):
-                    extract_band_name(file_path, band_name, output_tif)
+    tasks = []
+    with os.scandir(DOWNLOAD_FOLDER) as entries:
+        for entry in entries:
+            if entry.name.endswith((".hdf", ".h5")):
+                tasks.extend(get_extraction_tasks(entry.path, bands))
+
+    with ProcessPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+        futures = [executor.submit(extract_band_name, *task) for task in tasks]
+        for future in tqdm(as_completed(futures), desc="Processing HDF files", total=len(futures)):
+            future.result()
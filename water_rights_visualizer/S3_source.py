@@ -1,14 +1,17 @@
 import contextlib
+from functools import lru_cache
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from os import makedirs
 from os import remove
-from os.path import join, abspath, dirname, exists, expanduser
+from os.path import join, abspath, dirname, exists, expanduser, getmtime, splitext
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 import pandas as pd
-from dateutil import parser
 import logging
 import cl
 
@@ -16,12 +19,80 @@ import raster as rt
 
 from .errors import FileUnavailable
 from .data_source import DataSource
+from .date_helpers import parse_date
 from .variable_types import get_available_variable_source_for_date, get_available_variables_for_date
 
 logger = logging.getLogger(__name__)
 
 REMOVE_TEMPORARY_FILES = True
 
+# Concurrent downloads in prefetch, well under the client's connection pool
+PREFETCH_WORKERS = 16
+
+# Enough pooled keep-alive connections for concurrent downloads to reuse instead of handshaking per object
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+
+# Split rasters over 8 MB into concurrent ranged GETs instead of pulling each one in a single stream
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True,
+)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(date_string: str):
+    # The same few dates are requested for every tile and variable, so parse each string once
+    return parse_date(date_string)
+
+
+def read_S3_table(S3_table_filename: str) -> pd.DataFrame:
+    """
+    Read the S3 manifest, preferring the typed Parquet copy written by pipelines/convert_manifest_to_parquet.py.
+
+    The Parquet copy is only used when it is at least as new as the CSV, and the CSV is read when pyarrow is missing.
+    """
+    parquet_filename = splitext(S3_table_filename)[0] + ".parquet"
+
+    if exists(parquet_filename) and (
+        not exists(S3_table_filename) or getmtime(parquet_filename) >= getmtime(S3_table_filename)
+    ):
+        try:
+            return pd.read_parquet(parquet_filename)
+        except ImportError as e:
+            logger.warning(f"unable to read S3 manifest {parquet_filename}, reading {S3_table_filename}: {e}")
+
+    return pd.read_csv(S3_table_filename)
+
+
+def parse_S3_table_dates(dates: pd.Series) -> pd.Series:
+    """
+    Parse the manifest's date column, leaving NaT where a date can't be parsed.
+
+    ISO 8601 dates are parsed in one vectorized pass; each date repeats for every tile and variable. Dates in
+    any other format are parsed with parse_date, once per distinct string.
+    """
+    date_strings = dates.astype(str)
+    parsed_dates = pd.to_datetime(date_strings, format="ISO8601", errors="coerce", cache=True)
+
+    unparsed = parsed_dates.isna()
+    if unparsed.any():
+        reparsed_dates = {}
+        for date_string in date_strings[unparsed].unique():
+            try:
+                reparsed_dates[date_string] = pd.Timestamp(parse_date(date_string))
+            except (ValueError, OverflowError):
+                logger.warning(f"unable to parse date: {date_string}")
+
+        parsed_dates = parsed_dates.fillna(pd.to_datetime(date_strings.map(reparsed_dates)))
+
+    return parsed_dates
+
 
 class S3Source(DataSource):
     def __init__(
@@ -48,50 +119,78 @@ class S3Source(DataSource):
         if S3_table_filename is None:
             S3_table_filename = join(abspath(dirname(__file__)), "S3_filenames.csv")
 
-        S3_table = pd.read_csv(S3_table_filename)
+        S3_table = read_S3_table(S3_table_filename)
+
+        if pd.api.types.is_datetime64_any_dtype(S3_table.date):
+            # The Parquet manifest stores the dates already parsed
+            S3_table_dates = S3_table.date
+        else:
+            S3_table_dates = parse_S3_table_dates(S3_table.date)
+
+        # (tile, variable, YYYY-MM-DD) -> filename, keeping the first row for each key like the table scan did
+        S3_table_index = {}
+        for tile, variable, date_str, filename in zip(
+            S3_table.tile, S3_table.variable, S3_table_dates.dt.strftime("%Y-%m-%d"), S3_table.filename
+        ):
+            S3_table_index.setdefault((int(tile), variable, date_str), filename)
 
         if aws_profile is not None:
             session = boto3.Session(profile_name=aws_profile)
         else:
             session = boto3.Session()
 
-        bucket = session.resource("s3", region_name=region_name).Bucket(bucket_name)
+        bucket = session.resource("s3", region_name=region_name, config=S3_CLIENT_CONFIG).Bucket(bucket_name)
 
         self.bucket_name = bucket_name
         self.bucket = bucket
+        # The bucket's own low-level client, so resource and client calls share one connection pool
+        self.s3_client = bucket.meta.client
         self.region_name = region_name
         self.temporary_directory = temporary_directory
         self.S3_table = S3_table
+        self.S3_table_dates = S3_table_dates
+        self.S3_table_index = S3_table_index
         self.filenames = {}
+        # (filename, mtime, size) of files already known to open, so they aren't parsed again unless they change
+        self.verified_files = set()
         self.remove_temporary_files = remove_temporary_files
 
     def inventory(self):
+        # Whether each distinct date is one we care about, so the variable lookup runs once per date
+        date_is_available = {}
         dates_available = []
-        for date in self.S3_table.date:
-            try:
-                available_date = parser.parse(str(date)).date()
-                # Check variables to see if we care about this date
-                variables = get_available_variables_for_date(available_date)
-                if len(variables) > 0:
-                    if available_date.day == 1:
-                        dates_available.append(available_date)
-                    else:
-                        # If it's not the first of the month, make sure we have a non-monthly data source
-                        for variable in variables:
-                            if not variable.monthly:
-                                dates_available.append(available_date)
-                                break
-            except Exception as e:
-                logger.warning(e)
-                logger.warning(f"unable to parse date: {date}")
-        years_available = list(set(sorted([date_step.year for date_step in dates_available])))
+        for parsed_date in self.S3_table_dates:
+            if pd.isna(parsed_date):
+                # parse_S3_table_dates has already warned about it
+                continue
+
+            available_date = parsed_date.date()
+            if available_date not in date_is_available:
+                date_is_available[available_date] = self._is_date_available(available_date)
+
+            if date_is_available[available_date]:
+                dates_available.append(available_date)
+
+        years_available = sorted({date_step.year for date_step in dates_available})
 
         return years_available, dates_available
 
-    @contextlib.contextmanager
-    def get_filename(self, tile: str, variable_name: str, acquisition_date: str) -> str:
+    @staticmethod
+    def _is_date_available(available_date) -> bool:
+        # Check variables to see if we care about this date
+        variables = get_available_variables_for_date(available_date)
+        if len(variables) > 0:
+            if available_date.day == 1:
+                return True
+            else:
+                # If it's not the first of the month, make sure we have a non-monthly data source
+                return any(not variable.monthly for variable in variables)
+        return False
+
+    def _resolve_filename_base(self, tile: str, variable_name: str, acquisition_date) -> tuple[str, str]:
+        """Look up the cache key and S3 object name of a tile, variable and date, raising FileUnavailable if missing."""
         if isinstance(acquisition_date, str):
-            acquisition_date = parser.parse(acquisition_date).date()
+            acquisition_date = _parse_date(acquisition_date)
 
         variable_source = get_available_variable_source_for_date(variable_name, acquisition_date)
         if not variable_source:
@@ -103,32 +202,97 @@ class S3Source(DataSource):
 
         key = f"{int(tile):06d}_{str(mapped_variable)}_{date_str}"
 
-        if key in self.filenames:
-            yield self.filenames[key]
-            return
+        filename_base = self.S3_table_index.get((int(tile), mapped_variable, date_str))
 
-        # acquisition_date = acquisition_date.strftime("%Y-%m-%d")
+        if filename_base is None:
+            raise FileUnavailable(f"no files found for tile {tile} variable {variable_name} date {date_str}")
 
-        filtered_table = self.S3_table[
-            self.S3_table.apply(
-                lambda row: row.tile == int(tile)
-                and row.variable == mapped_variable
-                and parser.parse(str(row.date)).date().strftime("%Y-%m-%d") == date_str,
-                axis=1,
-            )
-        ]
+        return key, str(filename_base)
 
-        if len(filtered_table) == 0:
-            raise FileUnavailable(f"no files found for tile {tile} variable {variable_name} date {date_str}")
+    def prefetch(self, requests, max_workers: int = PREFETCH_WORKERS) -> list[str]:
+        """
+        Download the files for several (tile, variable_name, acquisition_date) requests concurrently.
+
+        Each object is a separate small GET, so downloading them one at a time from get_filename is bound by
+        request latency. Files already in the temporary directory and requests with no file are skipped;
+        get_filename then finds the downloaded files on disk.
 
-        matching_file_metadata = filtered_table.iloc[0]
+        Returns:
+            list[str]: The local filenames that were downloaded.
+        """
+        downloads = {}
+        for tile, variable_name, acquisition_date in requests:
+            try:
+                key, filename_base = self._resolve_filename_base(tile, variable_name, acquisition_date)
+            except FileUnavailable:
+                continue
+
+            filename = join(self.temporary_directory, filename_base)
+
+            if key in self.filenames or exists(filename):
+                continue
+
+            downloads[filename] = filename_base
+
+        if not downloads:
+            return []
+
+        logger.info(f"prefetching {len(downloads)} files from S3 bucket {cl.name(self.bucket_name)}")
+        start_time = time.perf_counter()
+
+        downloaded = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self.s3_client.download_file,
+                    self.bucket_name,
+                    filename_base,
+                    filename,
+                    Config=S3_TRANSFER_CONFIG,
+                ): filename
+                for filename, filename_base in downloads.items()
+            }
+
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    # get_filename retries and reports the failure when the file is actually needed
+                    logger.warning(f"failed to prefetch file from S3: {downloads[filename]} ({filename}) - {e}")
+                    continue
+
+                # Trusted like a file downloaded by get_filename, which isn't opened to verify it either
+                self.verified_files.add(self._file_signature(filename))
+                downloaded.append(filename)
+
+        duration_seconds = time.perf_counter() - start_time
+        logger.info(f"prefetched {len(downloaded)} files from S3 in {cl.time(duration_seconds)} seconds")
+
+        return downloaded
+
+    @staticmethod
+    def _file_signature(filename: str) -> tuple:
+        # A file replaced on disk gets a new modification time or size, so it is verified again
+        stat = os.stat(filename)
+        return filename, stat.st_mtime_ns, stat.st_size
+
+    @contextlib.contextmanager
+    def get_filename(self, tile: str, variable_name: str, acquisition_date: str) -> str:
+        key, filename_base = self._resolve_filename_base(tile, variable_name, acquisition_date)
+
+        if key in self.filenames:
+            yield self.filenames[key]
+            return
 
-        filename_base = str(matching_file_metadata.filename)
         filename = join(self.temporary_directory, filename_base)
 
         if exists(filename):
+            signature = self._file_signature(filename)
             try:
-                image = rt.Raster.open(filename)
+                if signature not in self.verified_files:
+                    image = rt.Raster.open(filename)
+                    self.verified_files.add(signature)
             except Exception as e:
                 logger.warning(e)
                 logger.warning(f"removing corrupted file: {filename}")
@@ -141,7 +305,7 @@ class S3Source(DataSource):
             failed_to_retrieve = False
             start_time = time.perf_counter()
             try:
-                self.bucket.download_file(filename_base, filename)
+                self.bucket.download_file(filename_base, filename, Config=S3_TRANSFER_CONFIG)
             except Exception as e:
                 logger.error(f"Failed to retrieve file from S3: {filename_base} ({filename}) - {e}")
                 failed_to_retrieve = True
@@ -1,5 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
-from os import makedirs, listdir, remove
+from os import makedirs, listdir, remove, scandir
 from os.path import exists, isfile, join, basename, splitext
 from glob import glob
 import csv
@@ -7,6 +8,7 @@ import numpy as np
 import pandas as pd
 from shapely.geometry import Polygon
 import rasterio
+from rasterio.features import geometry_mask
 from rasterio.mask import mask, raster_geometry_mask
 from logging import getLogger
 import re
@@ -18,6 +20,13 @@ logger = getLogger(__name__)
 
 NUMBER_OF_MODELS = 6
 
+UNCERTAINTY_VARIABLES = ["ET_MIN", "ET_MAX", "COUNT", "PPT"]
+
+# Date and variable of an uncertainty subset file, e.g. 2021.02.01_ROI_ET_MIN_subset.tif
+UNCERTAINTY_SUBSET_PATTERN = re.compile(
+    rf"(\d{{4}})\.(\d{{2}})\.(\d{{2}}).*_({'|'.join(UNCERTAINTY_VARIABLES)})_subset\.tif$"
+)
+
 
 def get_days_in_month(year, month):
     # Calculate the first day of the next month
@@ -32,7 +41,57 @@ def get_days_in_month(year, month):
     return last_day_of_month.day
 
 
-def get_nan_tiff_roi_average(tiff_file, ROI_geometry, dir, min_value=0) -> Union[float, None]:
+def get_roi_mask(ROI_geometry, out_shape, transform, roi_masks=None) -> np.ndarray:
+    """
+    Rasterize the region of interest to a boolean mask that is True inside the polygon.
+
+    Args:
+        ROI_geometry (Polygon): The region of interest polygon used for masking the subset files.
+        out_shape (tuple): The (rows, cols) shape of the raster.
+        transform (Affine): The affine transform of the raster.
+        roi_masks (dict): Optional cache of masks by grid, shared by subsets on the same grid.
+
+    Returns:
+        np.ndarray: The boolean ROI mask.
+    """
+    key = (transform.to_gdal(), tuple(out_shape))
+    if roi_masks is not None and key in roi_masks:
+        return roi_masks[key]
+
+    roi_mask = geometry_mask(ROI_geometry, out_shape=out_shape, transform=transform, invert=True)
+
+    if roi_masks is not None:
+        roi_masks[key] = roi_mask
+
+    return roi_mask
+
+
+def write_roi_masked_subset(subset_tiles, roi_mask, dir) -> str:
+    """
+    Save a subset with the pixels outside the ROI set to nodata as a _nan.tif file in the given directory.
+
+    Args:
+        subset_tiles (DatasetReader): The open subset file.
+        roi_mask (np.ndarray): The boolean ROI mask from get_roi_mask.
+        dir (str): The directory to save the masked subset file in.
+
+    Returns:
+        str: The masked subset filename.
+    """
+    out_image = subset_tiles.read()
+    # mask() fills with 0 when the raster has no nodata value
+    out_image[:, ~roi_mask] = subset_tiles.nodata if subset_tiles.nodata is not None else 0
+    nan_masked_subset_file = splitext(dir + "/" + basename(subset_tiles.name))[0] + "_nan.tif"
+
+    with rasterio.open(nan_masked_subset_file, "w", **subset_tiles.meta) as dest:
+        dest.write(out_image)
+
+    return nan_masked_subset_file
+
+
+def get_nan_tiff_roi_average(
+    tiff_file, ROI_geometry, dir, min_value=0, save_mask=False, roi_masks=None
+) -> Union[float, None]:
     """
     Get the average of the non-NaN values in the subset file within the given directory.
 
@@ -40,44 +99,31 @@ def get_nan_tiff_roi_average(tiff_file, ROI_geometry, dir, min_value=0) -> Union
         tiff_file (str): The subset file to calculate the average of non-NaN values.
         ROI_geometry (Polygon): The region of interest polygon used for masking the subset files.
         dir (str): The directory containing the subset files.
+        min_value (float): Values below this are excluded from the average.
+        save_mask (bool): Whether to also save the masked subset to dir as a _nan.tif file.
+        roi_masks (dict): Optional cache of ROI masks by grid, see get_roi_mask.
 
     Returns:
         Union[float, None]: The average of the non-NaN values in the subset file or None if an error occurs.
     """
-    filename = basename(tiff_file)
-
     if not tiff_file or not exists(tiff_file):
         logger.error(f"NaN TIFF subset file '{tiff_file}' does not exist")
         return None
 
-    nan_masked_subset_file = None
     with rasterio.open(tiff_file) as subset_tiles:
-        # Masking the ET subset file with the ROI_for_nan polygon
-        out_image, out_transform = mask(subset_tiles, ROI_geometry, crop=False)
-        out_meta = subset_tiles.meta.copy()
-        out_meta.update(
-            {
-                "driver": "GTiff",
-                "height": out_image.shape[1],
-                "width": out_image.shape[2],
-                "transform": out_transform,
-            }
-        )
-        nan_masked_subset_file = splitext(dir + "/" + basename(subset_tiles.name))[0] + "_nan.tif"
-        # Saving the masked subset as a new file in the nan_subset_directory
-        with rasterio.open(nan_masked_subset_file, "w", **out_meta) as dest:
-            dest.write(out_image)
+        # Every subset of an ROI shares one grid, so the polygon is rasterized once rather than by mask() per file
+        roi_mask = get_roi_mask(ROI_geometry, subset_tiles.shape, subset_tiles.transform, roi_masks)
+        nodata = subset_tiles.nodata
+        data = subset_tiles.read(1)
 
-    if not nan_masked_subset_file:
-        logger.error(f"Failed to create nan masked subset file for {filename}")
-        return None
+        if save_mask:
+            write_roi_masked_subset(subset_tiles, roi_mask, dir)
 
-    with rasterio.open(nan_masked_subset_file) as src:
-        data = src.read(1)
-        data = data[data != src.nodata]
-        data = data[~np.isnan(data)]
-        data = data[data >= min_value]  # No negative values allowed
-        return np.nanmean(data)
+    data = data[roi_mask]
+    data = data[data != nodata]
+    data = data[~np.isnan(data)]
+    data = data[data >= min_value]  # No negative values allowed
+    return np.nanmean(data)
 
 
 def calculate_cloud_coverage_percent(
@@ -103,24 +149,26 @@ def calculate_cloud_coverage_percent(
         makedirs(nan_subset_directory)
 
     yearly_ccount_percentages = {}
+    # ROI masks by grid, rasterized once and shared by every month and variable
+    roi_masks = {}
 
     year_month = {}
-    uncertainty_variables = ["ET_MIN", "ET_MAX", "COUNT", "PPT"]
-    for variable in uncertainty_variables:
-        subset_files = glob(f"{subset_directory}/*_{variable}_subset.tif")
-        for subset_file in subset_files:
-            filename = basename(subset_file)
-            match = re.match(rf"(\d{{4}})\.(\d{{2}})\.(\d{{2}}).*_{variable}_subset\.tif", filename)
-            year = match.group(1)
+    # One pass over the directory for all of the uncertainty variables
+    with scandir(subset_directory) as entries:
+        for entry in entries:
+            match = UNCERTAINTY_SUBSET_PATTERN.match(entry.name)
+            if not match:
+                continue
+
+            year, month, _, variable = match.groups()
 
             # Only process the files for the target year
             if int(year) != target_year:
                 continue
-            month = match.group(2)
             key = f"{year}-{month}"
             if not year_month.get(key):
                 year_month[key] = {"year": year, "month": month}
-            year_month[key][variable] = subset_file
+            year_month[key][variable] = entry.path
 
     for key, variable_files in year_month.items():
         year = variable_files["year"]
@@ -138,23 +186,52 @@ def calculate_cloud_coverage_percent(
 
         cloud_coverage = get_landsat_month_stats(ROI_geometry, int(month), int(year), subset_directory=nan_subset_directory)
 
+        # The averages are independent reads, so they run concurrently. They start after the Landsat lookup, which
+        # swaps the PROJ environment variables while it runs.
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            ccount_future = None
+            if not cloud_coverage:
+                ccount_future = executor.submit(
+                    get_nan_tiff_roi_average, ccount_subset_file, ROI_geometry, nan_subset_directory, roi_masks=roi_masks
+                )
+            et_min_future = executor.submit(
+                get_nan_tiff_roi_average,
+                et_min_subset_file,
+                ROI_geometry,
+                nan_subset_directory,
+                min_value=1,
+                roi_masks=roi_masks,
+            )
+            et_max_future = executor.submit(
+                get_nan_tiff_roi_average,
+                et_max_subset_file,
+                ROI_geometry,
+                nan_subset_directory,
+                min_value=1,
+                roi_masks=roi_masks,
+            )
+            ppt_future = executor.submit(
+                get_nan_tiff_roi_average, ppt_subset_file, ROI_geometry, nan_subset_directory, roi_masks=roi_masks
+            )
+
         # If we can't calculate cloud coverage, use the ccount data
         ccount_average = None
         if not cloud_coverage:
-            ccount_average = get_nan_tiff_roi_average(ccount_subset_file, ROI_geometry, nan_subset_directory)
+            ccount_average = ccount_future.result()
             cloud_coverage = {}
             if ccount_average is None:
                 logger.error(f"Failed to calculate cloud coverage percentage for {year}-{month} ({ccount_subset_file})")
 
-        et_min_average = get_nan_tiff_roi_average(et_min_subset_file, ROI_geometry, nan_subset_directory, min_value=1)
+        et_min_average = et_min_future.result()
+        et_max_average = et_max_future.result()
+        ppt_average = ppt_future.result()
+
         if et_min_average is None:
             logger.error(f"Failed to calculate ET min average for {year}-{month} ({et_min_subset_file})")
 
-        et_max_average = get_nan_tiff_roi_average(et_max_subset_file, ROI_geometry, nan_subset_directory, min_value=1)
         if et_max_average is None:
             logger.error(f"Failed to calculate ET max average for {year}-{month} ({et_max_subset_file})")
 
-        ppt_average = get_nan_tiff_roi_average(ppt_subset_file, ROI_geometry, nan_subset_directory)
         if ppt_average is None:
             logger.error(f"Failed to calculate PPT average for {year}-{month} ({ppt_subset_file})")
 
@@ -179,11 +256,16 @@ def calculate_cloud_coverage_percent(
     for year, month_percentages in yearly_ccount_percentages.items():
         # If there's already a CSV file for the year, fill that in, but prefer the new data
         monthly_ccount_percent_csv = f"{monthly_nan_directory}/{year}.csv"
-        existing_nan_percent_csv = None
+        # Existing percent_nan by month number, keeping the first row for a month like the lookup always has
+        existing_percent_by_month = {}
         if exists(monthly_ccount_percent_csv):
             existing_nan_percent_csv = pd.read_csv(monthly_ccount_percent_csv)
+            existing_months = pd.to_numeric(existing_nan_percent_csv["month"], errors="coerce")
+            for existing_month, existing_percent in zip(existing_months, existing_nan_percent_csv["percent_nan"]):
+                existing_percent_by_month.setdefault(existing_month, existing_percent)
 
-        monthly_ccount = pd.DataFrame(columns=["year", "month", "percent_nan", "avg_min", "avg_max", "ppt_avg"])
+        # One row per month, built into the DataFrame at once rather than appended with .loc
+        monthly_ccount_rows = []
         for month in range(1, 13):
             # Pad month with 0 if less than 10
             month_key = f"{month:02d}"
@@ -200,13 +282,10 @@ def calculate_cloud_coverage_percent(
                 percentage = max(percentage, 0)
                 percentage = min(percentage, 1)
 
-            if percentage is None and existing_nan_percent_csv is not None:
-                month_matches = pd.to_numeric(existing_nan_percent_csv["month"], errors="coerce")
-                existing_row = existing_nan_percent_csv.loc[month_matches == month]
-                if not existing_row.empty:
-                    existing_percent = existing_row["percent_nan"].values[0]
-                    if existing_percent != "" and not pd.isna(existing_percent):
-                        percentage = float(existing_percent) / 100
+            if percentage is None and month in existing_percent_by_month:
+                existing_percent = existing_percent_by_month[month]
+                if existing_percent != "" and not pd.isna(existing_percent):
+                    percentage = float(existing_percent) / 100
 
             rounded_percentage = round(percentage * 100, 2) if percentage is not None else ""
             avg_min = percentages.get("avg_min") or 0
@@ -215,13 +294,18 @@ def calculate_cloud_coverage_percent(
             rounded_avg_min = round(avg_min, 2)
             rounded_avg_max = round(avg_max, 2)
             rounded_ppt_avg = round(ppt_avg, 2)
-            monthly_ccount.loc[len(monthly_ccount)] = [
-                str(year),
-                month,
-                rounded_percentage,
-                rounded_avg_min,
-                rounded_avg_max,
-                rounded_ppt_avg,
-            ]
-
+            monthly_ccount_rows.append(
+                (
+                    str(year),
+                    month,
+                    rounded_percentage,
+                    rounded_avg_min,
+                    rounded_avg_max,
+                    rounded_ppt_avg,
+                )
+            )
+
+        monthly_ccount = pd.DataFrame.from_records(
+            monthly_ccount_rows, columns=["year", "month", "percent_nan", "avg_min", "avg_max", "ppt_avg"]
+        )
         monthly_ccount.to_csv(monthly_ccount_percent_csv, index=False)
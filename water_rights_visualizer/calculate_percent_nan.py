@@ -1,17 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 from os import makedirs, listdir, remove
 from os.path import exists, isfile, join, basename, splitext
 from glob import glob
-import csv
 import numpy as np
 import pandas as pd
 from shapely.geometry import Polygon
 import rasterio
 from rasterio.mask import mask, raster_geometry_mask
 from logging import getLogger
-from .calculate_cloud_coverage_percent import get_nan_tiff_roi_average
+from .calculate_cloud_coverage_percent import get_nan_tiff_roi_average, get_roi_mask, write_roi_masked_subset
 
 logger = getLogger(__name__)
 
+# Masked subsets read concurrently; rasterio releases the GIL while GDAL reads and decodes
+READ_WORKERS = 8
+
 
 # Defining the function calculate_percent_nan
 def calculate_percent_nan(
@@ -36,6 +39,9 @@ def calculate_percent_nan(
 
     nan_subsets = nan_subset_directory
 
+    # ROI masks by grid, rasterized once and shared by every subset of the year
+    roi_masks = {}
+
     # Looping through the files in the subset_directory
     for subset_file in listdir(subset_directory):
         # Checking if the file is a valid ET subset file and matches year
@@ -46,20 +52,8 @@ def calculate_percent_nan(
         ):
             # Opening the ET subset file
             with rasterio.open(join(subset_directory, subset_file)) as p:
-                # Masking the ET subset file with the ROI_for_nan polygon
-                out_image, out_transform = mask(p, ROI_for_nan, crop=False)
-                out_meta = p.meta.copy()
-                out_meta.update(
-                    {
-                        "driver": "GTiff",
-                        "height": out_image.shape[1],
-                        "width": out_image.shape[2],
-                        "transform": out_transform,
-                    }
-                )
-                # Saving the masked subset as a new file in the nan_subset_directory
-                with rasterio.open(splitext(nan_subsets + "/" + basename(p.name))[0] + "_nan.tif", "w", **out_meta) as dest:
-                    dest.write(out_image)
+                # Masking the ET subset file with the ROI_for_nan polygon and saving it in the nan_subset_directory
+                write_roi_masked_subset(p, get_roi_mask(ROI_for_nan, p.shape, p.transform, roi_masks), nan_subsets)
 
     # Opening the first ET subset file in the subset_directory
     subset_filenames = sorted(glob(join(subset_directory, "*.tif")))
@@ -86,49 +80,36 @@ def calculate_percent_nan(
     area_mask = open_mask.read()
     # Counting the number of pixels with value 0 (outside the ROI_for_nan polygon)
     area = np.count_nonzero(((area_mask[0][roi_mask[0]])) == 0)
-    ET_subset = rasterio.open(nan_subsets + "/" + listdir(nan_subsets)[0])
-    base_name = basename(ET_subset.name)
-    file_name = splitext(base_name)[0]
-    subset_in_mskdir = rasterio.open(nan_subsets + "/" + file_name + ".tif")
     percent_nan = []
     msk_subsets = glob(join(nan_subsets, "*.tif"))
 
     # Filter out all files that don't match the year
     msk_subsets = [filename for filename in msk_subsets if basename(filename).startswith(str(target_year))]
 
-    # Function to read a raster file
+    # Function to read the first band of a raster file
     def read_file(file):
         with rasterio.open(file) as src:
-            return src.read()
+            return src.read(1)
 
     # Creating a list of arrays, each representing a masked subset
-    array_list = [read_file(x) for x in msk_subsets]
-
-    # Looping through the array_list and calculating the percentage of NaN values
-    for subsets in array_list:
-        counted_nans = np.count_nonzero((np.isnan(subsets[0][roi_mask[0]])))
-        cell_count = len(subsets[0][roi_mask[0]].flatten())
-        count_nan = []
-        count_nan.append(counted_nans)
-        for nans in count_nan:
-            # if area == 0:
-            #     ratio_of_nan = (nans / 1)
-            #     percent_of_nan = ratio_of_nan * 100
-            #     percent_nan.append(percent_of_nan)
-            # else:
-            #     ratio_of_nan = (nans / area)
-            #     percent_of_nan = ratio_of_nan * 100
-            #     percent_nan.append(percent_of_nan)
-            percent_nan.append(nans / cell_count * 100)
+    array_list = []
+    if msk_subsets:
+        with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(msk_subsets))) as executor:
+            array_list = list(executor.map(read_file, msk_subsets))
+
+    # Calculating the percentage of NaN values within the ROI of every subset at once from a (subsets, ROI cells) array
+    if array_list:
+        roi_cells = np.stack(array_list)[:, roi_mask[0]]
+        percent_nan = (np.isnan(roi_cells).sum(axis=1) / roi_cells.shape[1] * 100).tolist()
 
     # Extracting the dates from the file names
     dates = []
 
+    # The date is in the file name, so the subsets don't need to be opened again
     for msk_subset in msk_subsets:
-        with rasterio.open(msk_subset) as t:
-            paths = basename(t.name)
-            date_split = paths.split("_")[0]
-            dates.append(date_split)
+        paths = basename(msk_subset)
+        date_split = paths.split("_")[0]
+        dates.append(date_split)
 
     years = []
     months = []
@@ -147,30 +128,15 @@ def calculate_percent_nan(
     if not exists(monthly_nan_directory):
         makedirs(monthly_nan_directory)
 
-    nan_csv = "nan_avg.csv"
-    nan_monthly_csv = "nan_monthly_avg.csv"
-    nan_folder = join(monthly_nan_directory, nan_csv)
-    nan_monthly_folder = join(monthly_nan_directory, nan_monthly_csv)
-
-    # Writing the percent_nan, year, and month to a CSV file
-    with open(nan_folder, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["percent_nan", "year", "month"])
-        rows = zip(percent_nan, years, months)
-
-        for row in rows:
-            writer.writerow(row)
-
-    nan_avg = list()
-    nanavg = pd.read_csv(nan_folder)
-    group = nanavg.groupby(["year", "month"])
-    monthavg = group.aggregate({"percent_nan": np.mean})
-    nan_avg.append(monthavg)
-    conavg = pd.concat(nan_avg, ignore_index=False)
-    conavg.to_csv(nan_monthly_folder)
-    sort_order = pd.read_csv(nan_monthly_folder)
-    sort_ascend = sort_order.sort_values("year", ascending=False)
-    nan_monthly_avg = pd.read_csv(nan_monthly_folder)
+    # Averaging the percent_nan of each month in memory
+    nan_avg = pd.DataFrame(
+        {
+            "percent_nan": pd.Series(percent_nan, dtype=float),
+            "year": pd.Series([int(year) for year in years], dtype=int),
+            "month": pd.Series([int(month) for month in months], dtype=int),
+        }
+    )
+    nan_monthly_avg = nan_avg.groupby(["year", "month"], as_index=False)["percent_nan"].mean()
     nan_monthly_avg["Year"] = nan_monthly_avg["year"]
 
     ppt_values = []
@@ -179,7 +145,9 @@ def calculate_percent_nan(
     for ppt_subset_file in ppt_subset_files:
         filename = basename(ppt_subset_file)
         year, month = map(int, filename.split("_")[0].split(".")[:2])
-        ppt_average = get_nan_tiff_roi_average(ppt_subset_file, ROI_for_nan, nan_subset_directory) or 0
+        ppt_average = (
+            get_nan_tiff_roi_average(ppt_subset_file, ROI_for_nan, nan_subset_directory, roi_masks=roi_masks) or 0
+        )
         ppt_values.append({"ppt_avg": ppt_average, "month": month, "year": year})
 
     # Convert PPT values to DataFrame and merge with monthly averages
@@ -189,10 +157,7 @@ def calculate_percent_nan(
 
     cols_nan = nan_monthly_avg.columns
     # Splitting the data into separate CSV files for each year
-    for year in set(nan_monthly_avg["Year"]):
+    for year, year_nan_monthly_avg in nan_monthly_avg.groupby("Year", sort=False):
         new_csv_by_year = monthly_nan_directory + "/" + str(year) + ".csv"
-        nan_monthly_avg.loc[nan_monthly_avg["Year"] == year].to_csv(new_csv_by_year, index=False, columns=cols_nan)
+        year_nan_monthly_avg.to_csv(new_csv_by_year, index=False, columns=cols_nan)
 
-    # # Removing the temporary CSV files
-    remove(nan_monthly_folder)
-    remove(nan_folder)
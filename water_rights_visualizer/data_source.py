@@ -31,3 +31,18 @@ class DataSource:
         """
 
         pass
+
+    def prefetch(self, requests) -> list[str]:
+        """
+        Retrieves the files for several requests ahead of the get_filename calls that use them.
+
+        Sources with files already on disk have nothing to do, so the default is a no-op.
+
+        Args:
+            requests (list[tuple]): (tile, variable_name, acquisition_date) tuples.
+
+        Returns:
+            list[str]: The filenames that were retrieved.
+        """
+
+        return []
@@ -1,13 +1,37 @@
-import math
+import numpy as np
 import datetime
 import logging
+from functools import lru_cache
 
+from dateutil import parser
 from dateutil.relativedelta import relativedelta
 
 
 logger = logging.getLogger(__name__)
 
 
+def parse_date(date_string) -> datetime.date:
+    """
+    Parse a date string, taking the ISO 8601 fast path for the YYYY-MM-DD dates in the manifests.
+
+    Args:
+        date_string: The date string, or any value whose string form is a date.
+    Returns:
+        The parsed date.
+    """
+    date_string = str(date_string)
+
+    # Only drop a time part; anything else after the date must not be silently ignored
+    if len(date_string) == 10 or (len(date_string) > 10 and date_string[10] in "T "):
+        try:
+            return datetime.date.fromisoformat(date_string[:10])
+        except ValueError:
+            pass
+
+    # Anything else goes through dateutil's much slower heuristic parser
+    return parser.parse(date_string).date()
+
+
 def get_one_month_slice(year: int, month: int) -> slice:
     """
     Get the start (inclusive) and end (not inclusive) indices for a given month.
@@ -58,6 +82,7 @@ def get_day_of_year(year: int, month: int, day: int) -> int:
 
 # Daylight calculations adapted from OpenET PTJPL library to not rely on Earth Engine:
 # https://github.com/Open-ET/openet-ptjpl/blob/main/openet/ptjpl/daylight_hours.py
+# The helpers use NumPy so they take a scalar day of year or an array of them
 def day_angle_rad_from_doy(doy):
     """
     Calculate day angle in radians from day of year between 1 and 365.
@@ -66,7 +91,7 @@ def day_angle_rad_from_doy(doy):
     Returns:
         Day angle in radians.
     """
-    return (2 * math.pi * (doy - 1)) / 365
+    return (2 * np.pi * (doy - 1)) / 365
 
 
 def solar_dec_deg_from_day_angle_rad(day_angle_rad):
@@ -79,13 +104,13 @@ def solar_dec_deg_from_day_angle_rad(day_angle_rad):
     """
     return (
         0.006918
-        - 0.399912 * math.cos(day_angle_rad)
-        + 0.070257 * math.sin(day_angle_rad)
-        - 0.006758 * math.cos(2 * day_angle_rad)
-        + 0.000907 * math.sin(2 * day_angle_rad)
-        - 0.002697 * math.cos(3 * day_angle_rad)
-        + 0.00148 * math.sin(3 * day_angle_rad)
-    ) * (180 / math.pi)
+        - 0.399912 * np.cos(day_angle_rad)
+        + 0.070257 * np.sin(day_angle_rad)
+        - 0.006758 * np.cos(2 * day_angle_rad)
+        + 0.000907 * np.sin(2 * day_angle_rad)
+        - 0.002697 * np.cos(3 * day_angle_rad)
+        + 0.00148 * np.sin(3 * day_angle_rad)
+    ) * (180 / np.pi)
 
 
 def sha_deg_from_doy_lat(doy, latitude):
@@ -105,23 +130,20 @@ def sha_deg_from_doy_lat(doy, latitude):
     solar_dec_deg = solar_dec_deg_from_day_angle_rad(day_angle_rad)
 
     # Convert latitude and solar declination to radians
-    latitude_rad = math.radians(latitude)
-    solar_dec_rad = math.radians(solar_dec_deg)
+    latitude_rad = np.radians(latitude)
+    solar_dec_rad = np.radians(solar_dec_deg)
 
     # Calculate cosine of sunrise angle at latitude and solar declination
-    sunrise_cos = -math.tan(latitude_rad) * math.tan(solar_dec_rad)
+    sunrise_cos = -np.tan(latitude_rad) * np.tan(solar_dec_rad)
 
-    # Apply polar correction
-    if sunrise_cos >= 1:
-        return 0  # No sunrise
-    elif sunrise_cos <= -1:
-        return 180  # No sunset
+    # Apply polar correction: clipping gives 0 degrees with no sunrise and 180 degrees with no sunset
+    sunrise_cos = np.clip(sunrise_cos, -1, 1)
 
     # Calculate sunrise angle in radians from cosine
-    sunrise_rad = math.acos(sunrise_cos)
+    sunrise_rad = np.arccos(sunrise_cos)
 
     # Convert to degrees
-    return math.degrees(sunrise_rad)
+    return np.degrees(sunrise_rad)
 
 
 def sunrise_from_sha(sha_deg):
@@ -162,8 +184,32 @@ def calculate_hours_of_sunlight(ROI_latlon, date_step: datetime.date):
     doy = date_step.timetuple().tm_yday
     latitude = ROI_latlon.centroid.y
 
-    sha_deg = sha_deg_from_doy_lat(doy, latitude)
-
-    daylight_hours = daylight_from_sha(sha_deg)
+    daylight_hours = daylight_hours_from_doy_lat(doy, latitude)
 
     return daylight_hours
+
+
+# There are only 366 days of year and an ROI has one latitude, so the scalar results are cached
+@lru_cache(maxsize=512)
+def daylight_hours_from_doy_lat(doy: int, latitude: float) -> float:
+    """
+    Calculate the daylight hours of one day of year at a latitude.
+    """
+    return float(daylight_from_sha(sha_deg_from_doy_lat(doy, latitude)))
+
+
+def daylight_hours_series(year: int, latitude: float) -> np.ndarray:
+    """
+    Calculate the daylight hours of every day of a year at a latitude in one vectorized pass.
+
+    Matches calculate_hours_of_sunlight day by day, including the polar correction.
+
+    Args:
+        year: The year for which to calculate the daylight hours.
+        latitude: Latitude in degrees.
+    Returns:
+        Array of daylight hours indexed by day of year - 1.
+    """
+    doy = np.arange(1, get_days_in_year(year) + 1)
+
+    return daylight_from_sha(sha_deg_from_doy_lat(doy, latitude))
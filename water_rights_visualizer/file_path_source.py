@@ -4,11 +4,11 @@ from glob import glob
 from os.path import abspath, expanduser, exists, join, isdir, basename
 from typing import Union
 
-from dateutil import parser
 import logging
 import cl
 from .errors import FileUnavailable
 from .data_source import DataSource
+from .date_helpers import parse_date
 from .variable_types import get_sources_for_variable, get_available_variable_source_for_date
 
 logger = logging.getLogger(__name__)
@@ -44,7 +44,7 @@ class FilepathSource(DataSource):
             str: The directory path for the acquisition date.
         """
         if isinstance(acquisition_date, str):
-            acquisition_date = parser.parse(acquisition_date).date()
+            acquisition_date = parse_date(acquisition_date)
 
         date_directory = join(self.directory, f"{acquisition_date:%Y.%m.%d}")
 
@@ -21,6 +21,7 @@ from .date_helpers import (
     get_one_month_slice,
     get_days_in_month,
     calculate_hours_of_sunlight,
+    daylight_hours_series,
 )
 from .variable_types import get_available_variable_source_for_date
 
@@ -248,11 +249,11 @@ def generate_stack(
                     logger.info(
                         f"PET source is not daylight corrected, applying correction for {date_step} ({day_of_year}, {last_doy})"
                     )
-                    for current_day in range(day_of_year, last_doy):
-                        current_day_step = datetime(year, month, current_day - day_of_year + 1).date()
-                        hours_of_sunlight = calculate_hours_of_sunlight(ROI_latlon, current_day_step)
-                        corrected_daily_pet_avg = daily_pet_avg / 24 * hours_of_sunlight
-                        PET_sparse_stack[current_day, :, :] = corrected_daily_pet_avg
+                    # Correct every day of the month at once from the year's daylight hours
+                    hours_of_sunlight = daylight_hours_series(year, ROI_latlon.centroid.y)[day_of_year:last_doy]
+                    PET_sparse_stack[day_of_year:last_doy, :, :] = (
+                        np.asarray(daily_pet_avg)[np.newaxis, :, :] / 24 * hours_of_sunlight[:, np.newaxis, np.newaxis]
+                    )
                 else:
                     logger.info(
                         f"PET source is daylight corrected, using daily average for {date_step} ({day_of_year}, {last_doy})"
@@ -138,6 +138,9 @@ def generate_subset(
 
     target_raster = None
 
+    # Retrieve every tile's file concurrently instead of one at a time in the loop below
+    input_datastore.prefetch([(tile, variable_name, acquisition_date) for tile in tiles])
+
     for tile in tiles:
         with input_datastore.get_filename(
             tile=tile, variable_name=variable_name, acquisition_date=acquisition_date
@@ -6,7 +6,6 @@ from os import remove
 from os.path import join, abspath, dirname, exists, expanduser
 
 import pandas as pd
-from dateutil import parser
 from pydrive2.drive import GoogleDrive
 import logging
 import cl
@@ -15,6 +14,7 @@ import raster as rt
 
 from .errors import FileUnavailable
 from .data_source import DataSource
+from .date_helpers import parse_date
 from .google_drive import google_drive_login
 
 logger = logging.getLogger(__name__)
@@ -62,7 +62,7 @@ class GoogleSource(DataSource):
 
     def inventory(self):
 
-        dates_available = [parser.parse(str(d)).date() for d in self.ID_table.date]
+        dates_available = [parse_date(d) for d in self.ID_table.date]
         years_available = list(set(sorted([date_step.year for date_step in dates_available])))
 
         return years_available, dates_available
@@ -70,7 +70,7 @@ class GoogleSource(DataSource):
     @contextlib.contextmanager
     def get_filename(self, tile: str, variable_name: str, acquisition_date: str) -> str:
         if isinstance(acquisition_date, str):
-            acquisition_date = parser.parse(acquisition_date).date()
+            acquisition_date = parse_date(acquisition_date)
 
         key = f"{int(tile):06d}_{str(variable_name)}_{acquisition_date:%Y-%m-%d}"
 
@@ -78,7 +78,7 @@ class GoogleSource(DataSource):
             return self.filenames[key]
 
         if isinstance(acquisition_date, str):
-            acquisition_date = parser.parse(acquisition_date).date()
+            acquisition_date = parse_date(acquisition_date)
 
         acquisition_date = acquisition_date.strftime("%Y-%m-%d")
 
@@ -86,7 +86,7 @@ class GoogleSource(DataSource):
             self.ID_table.apply(
                 lambda row: row.tile == int(tile)
                 and row.variable == variable_name
-                and parser.parse(str(row.date)).date().strftime("%Y-%m-%d") == acquisition_date,
+                and parse_date(row.date).strftime("%Y-%m-%d") == acquisition_date,
                 axis=1,
             )
         ]
@@ -1,6 +1,7 @@
 import os
 import yaml
 from datetime import datetime
+from functools import lru_cache
 from typing import TypedDict
 
 
@@ -112,6 +113,8 @@ def get_sources_for_variable(variable: str) -> list[VariableType]:
     return sources
 
 
+# The sources are fixed once the configuration is loaded, and the same variable and date recur for every tile
+@lru_cache(maxsize=4096)
 def get_available_variable_source_for_date(variable: str, date: datetime.date) -> VariableType | None:
     """
     Get the first available source for a given variable and date.